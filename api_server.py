@@ -0,0 +1,340 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Standalone API server for ``GET /api/data`` and ``GET /api/aggregate``.
+
+Run with:
+
+    python api_server.py --workers 4
+
+``main()`` ingests and indexes the workbook snapshot once in the parent
+process before the workers start, so the workers only attach to it. Every
+worker memory-maps the same snapshot files (columns, filter index and chart
+aggregates), so the data lives once in the OS page cache and is shared by all
+workers instead of each worker holding its own copy.
+
+``uvicorn api_server:app --workers 4`` skips that pre-load: when the snapshot
+is missing or stale, every worker parses the workbook and builds the index at
+the same time on its first boot. Use it only with a single worker or once the
+snapshot is up to date.
+
+Requests are rate limited per API key. Each worker keeps its own token
+buckets unless ``DATA_PLATFORM_RATE_LIMIT_DB`` names a SQLite file, in which
+case all workers draw from the same buckets.
+
+Responses carry an ETag derived from the snapshot version and the normalised
+request, so polling clients and reverse proxies can revalidate with
+``If-None-Match`` and get ``304 Not Modified`` without the data being read.
+Text formats are compressed with the best encoding the client accepts, as
+they stream, and small compressed bodies are cached per encoding.
+
+``GET /metrics`` exposes request latencies, stage timings and cache counters
+of the worker that answers it in the Prometheus text format.
+"""
+
+import time
+
+BOOT_TIME = time.perf_counter()  # start of the cold-start budget, before the heavy imports
+
+import argparse
+import email.utils
+import hashlib
+import logging
+import math
+import os
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+
+from dataplatform import arrow, compression, dataset, export, metrics, snapshot, warmup
+from dataplatform.cache import QueryCache
+from dataplatform.cube import aggregate
+from dataplatform.keys import KeyStore, hash_key
+from dataplatform.query import Aggregation, Page, Query
+from dataplatform.ratelimit import create_limiter, request_cost
+
+# Keys generated from the Streamlit app; usage is flushed in the background
+KEY_STORE = KeyStore()
+
+# Per-key token buckets; shared between workers when DATA_PLATFORM_RATE_LIMIT_DB is set
+RATE_LIMITER = create_limiter()
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "csv": "text/csv",
+    "ndjson": export.NDJSON_MIME,
+    "excel": export.EXCEL_MIME,
+    "arrow": export.ARROW_MIME,
+    "parquet": export.PARQUET_MIME,
+}
+DOWNLOAD_HEADERS = {
+    "csv": {"Content-Disposition": "attachment; filename=data.csv"},
+    "excel": {"Content-Disposition": "attachment; filename=data.xlsx"},
+    "arrow": {"Content-Disposition": "attachment; filename=data.arrow"},
+    "parquet": {"Content-Disposition": "attachment; filename=data.parquet"},
+}
+# Formats that are compressed already
+PRECOMPRESSED = {"excel", "parquet"}
+
+# Filtered rows and serialised responses, shared by all requests of this worker
+RESULT_CACHE = QueryCache()
+
+# Seconds a client or proxy may reuse a response before revalidating it
+CACHE_MAX_AGE = 60
+
+
+def get_dataset():
+    # Shared by all requests of this worker; picks up newly published versions
+    return dataset.current(snapshot.DATA_FILE, snapshot.DATA_SHEET)
+
+
+def _check_rate(api_key, limits, cost):
+    retry_after = RATE_LIMITER.acquire(hash_key(api_key), limits, cost)
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
+def _authorize(api_key):
+    limits = KEY_STORE.validate(api_key)
+    if limits is None:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    return limits
+
+
+def _filter_params(date, dates, start, end, items, currencies, maturities):
+    return {
+        name: value
+        for name, value in (
+            ("date", date), ("dates", dates), ("start", start), ("end", end),
+            ("items", items), ("currencies", currencies), ("maturities", maturities),
+        )
+        if value is not None
+    }
+
+
+def _etag(version, key):
+    # Same value in every worker: the key only holds normalised strings and numbers
+    digest = hashlib.sha256(repr((version, key)).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _not_modified(etag, modified, if_none_match, if_modified_since):
+    """Whether the client's cached copy is current; If-None-Match takes precedence."""
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if if_modified_since is not None and modified is not None:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=modified.tzinfo)
+        return modified <= since
+    return False
+
+
+def _cache_headers(data, key):
+    headers = {
+        "ETag": _etag(data.version, key),
+        "Cache-Control": f"public, max-age={CACHE_MAX_AGE}",
+        "Vary": "X-API-Key, Accept-Encoding",
+    }
+    if data.modified is not None:
+        headers["Last-Modified"] = email.utils.format_datetime(data.modified, usegmt=True)
+    return headers
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load and index in the background; early requests wait for the same load
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:     %(name)s - %(message)s")
+    warmup.start(BOOT_TIME)
+    yield
+
+
+app = FastAPI(title="Data Dissemination Platform API", lifespan=lifespan)
+
+
+@app.middleware("http")
+async def record_request(request: Request, call_next):
+    # Time to response headers; streamed bodies are timed by their export span
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.observe(f"request {route.path if route else 'unmatched'}", time.perf_counter() - start)
+    metrics.increment(f"http.status.{response.status_code}")
+    return response
+
+
+@app.get("/api/data")
+def get_data(
+    x_api_key: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    date: Optional[str] = None,
+    dates: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    items: Optional[str] = None,
+    currencies: Optional[str] = None,
+    maturities: Optional[str] = None,
+    format: str = "json",
+    orient: str = "records",
+    sort: Optional[str] = None,
+    offset: int = 0,
+    limit: Optional[int] = None
+):
+    # Validate API key
+    limits = _authorize(x_api_key)
+
+    params = _filter_params(date, dates, start, end, items, currencies, maturities)
+    try:
+        page = Page.from_params({"offset": offset, "limit": limit, "sort": sort})
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    data = get_dataset()
+    query = Query.from_params(params)
+    fmt = format.lower()
+    if fmt not in MEDIA_TYPES:
+        fmt = "json"  # json is default
+    if fmt in ("arrow", "parquet"):
+        try:
+            arrow.require_pyarrow()
+        except ImportError as exc:
+            raise HTTPException(status_code=501, detail=str(exc))
+    orient = "columns" if orient == "columns" else "records"
+    key = (fmt, query, page, orient) if fmt == "json" else (fmt, query, page)
+    media_type = MEDIA_TYPES[fmt]
+    # XLSX and Parquet are compressed already; compressing them again gains nothing
+    encoding = None if fmt in PRECOMPRESSED else compression.negotiate(accept_encoding)
+    encoded_key = (*key, encoding) if encoding else key
+
+    headers = _cache_headers(data, encoded_key)
+    if _not_modified(headers["ETag"], data.modified, if_none_match, if_modified_since):
+        # Revalidation costs the base request price only; no rows are selected
+        _check_rate(x_api_key, limits, request_cost(0, fmt))
+        return Response(status_code=304, headers=headers)
+    headers.update(DOWNLOAD_HEADERS.get(fmt, {}))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+
+    # Charge the key for the size of the page before sorting or serialising
+    total = len(RESULT_CACHE.rows(data, query))
+    _check_rate(x_api_key, limits, request_cost(page.count(total), fmt))
+
+    body = RESULT_CACHE.get(data.version, encoded_key)
+    if body is None and encoding:
+        # Compress a cached plain body once and keep the result for this encoding
+        plain = RESULT_CACHE.get(data.version, key)
+        if plain is not None:
+            body = compression.compress(plain, encoding)
+            RESULT_CACHE.put(data.version, encoded_key, body)
+    if body is not None:
+        return Response(body, media_type=media_type, headers=headers)
+
+    # Return requested format, streamed in batches
+    rows = RESULT_CACHE.page(data, query, page)
+    if fmt == "excel":
+        chunks = export.iter_xlsx(data, rows)
+    elif fmt == "arrow":
+        chunks = export.iter_arrow(data, rows)
+    elif fmt == "parquet":
+        chunks = export.iter_parquet(data, rows)
+    elif fmt == "csv":
+        chunks = export.iter_csv(data, rows)
+    elif fmt == "ndjson":
+        chunks = export.iter_ndjson(data, rows)
+    else:
+        chunks = export.iter_json(data, rows, orient=orient, total=None if page.is_full else total)
+    chunks = metrics.timed(f"export.{fmt}", chunks)
+    if encoding:
+        chunks = compression.iter_compressed(chunks, encoding)
+    return StreamingResponse(
+        RESULT_CACHE.stream(data.version, encoded_key, chunks),
+        media_type=media_type,
+        headers=headers
+    )
+
+
+@app.get("/api/aggregate")
+def get_aggregate(
+    x_api_key: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    date: Optional[str] = None,
+    dates: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    items: Optional[str] = None,
+    currencies: Optional[str] = None,
+    maturities: Optional[str] = None,
+    group_by: Optional[str] = None,
+    agg: str = "sum",
+    format: str = "json"
+):
+    # Validate API key
+    limits = _authorize(x_api_key)
+
+    try:
+        aggregation = Aggregation.from_params({"group_by": group_by, "agg": agg})
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    data = get_dataset()
+    query = Query.from_params(_filter_params(date, dates, start, end, items, currencies, maturities))
+    fmt = "csv" if format.lower() == "csv" else "json"
+    encoding = compression.negotiate(accept_encoding)
+    key = ("aggregate", fmt, query, aggregation, encoding)
+
+    # Rolled up from the pre-aggregated cube, so every request costs the base price
+    headers = _cache_headers(data, key)
+    _check_rate(x_api_key, limits, request_cost(0, fmt))
+    if _not_modified(headers["ETag"], data.modified, if_none_match, if_modified_since):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+
+    body = RESULT_CACHE.get(data.version, key)
+    if body is None:
+        result = aggregate(data, query, aggregation.group_by, aggregation.agg)
+        body = export.frame_to_bytes(result, fmt, group_by=list(aggregation.group_by), agg=aggregation.agg)
+        if encoding:
+            body = compression.compress(body, encoding)
+        RESULT_CACHE.put(data.version, key, body)
+    return Response(body, media_type=MEDIA_TYPES[fmt], headers=headers)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus text exposition of this worker's metrics; not rate limited."""
+    gauges = {f"result_cache_{name}": value for name, value in RESULT_CACHE.stats().items()}
+    return PlainTextResponse(metrics.REGISTRY.prometheus(gauges=gauges), media_type="text/plain; version=0.0.4")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    # Ingest and index once in the parent so the workers only attach to the snapshot
+    manifest = snapshot.refresh(snapshot.DATA_FILE, snapshot.DATA_SHEET)
+    dataset.Dataset.load(manifest["version"])
+    uvicorn.run("api_server:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
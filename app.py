@@ -7,53 +7,155 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import time
+
+BOOT_TIME = time.perf_counter()  # start of the cold-start budget
+
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import os
-import json
-from io import BytesIO
-import base64
-import uuid
 import datetime
-
-# --- Session State for API Keys and Configuration ---
-if 'api_keys' not in st.session_state:
-    st.session_state.api_keys = {}
-
+import json
+import logging
+import math
+from functools import partial
+
+from dataplatform import arrow, charts, compression, dataset, export, metrics, snapshot, warmup
+from dataplatform.cache import QueryCache
+from dataplatform.cube import label_totals
+from dataplatform.keys import KeyStore
+from dataplatform.query import Page, Query
+from dataplatform.ratelimit import DEFAULT_BURST, DEFAULT_DAILY_QUOTA, DEFAULT_RATE, Limits
+
+# --- Session State for Configuration ---
 # --- Default configuration ---
 if 'api_base_url' not in st.session_state:
     st.session_state.api_base_url = "https://yourdomain.com/api/data"
 
+# --- Warm up ---
+# Loads the dataset and imports plotly in a background thread on the first run of
+# this process, and logs how long the cold start took. plotly is otherwise only
+# imported when a chart type is selected.
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+warmup.start(BOOT_TIME, modules=("plotly.express",))
+
 # --- Load and clean data ---
-@st.cache_data
-def load_data():
-    df = pd.read_excel("your_data_file.xlsx", 2)  # Replace with your Excel file
-    df['OBS_DATE'] = pd.to_datetime(df['OBS_DATE'], errors='coerce')
-    df['ITEM'] = df['ITEM'].astype(str)
-    df['CURRENCY'] = df['CURRENCY'].astype(str)
-    df['RESIDUAL_MATURITY'] = df['RESIDUAL_MATURITY'].astype(str)
-    df['AMOUNT'] = pd.to_numeric(df['AMOUNT'], errors='coerce')
-    return df.dropna(subset=['OBS_DATE', 'ITEM', 'CURRENCY', 'RESIDUAL_MATURITY', 'AMOUNT'])
-
-df = load_data()
-date_options = sorted(df['OBS_DATE'].dt.date.unique())  # Needed for both modes
+# The workbook is ingested into a columnar snapshot once per version (see
+# dataplatform/snapshot.py); reruns only stat the file and memory-map the columns.
+# The encoded dataset is shared by all sessions of this process, not copied per rerun,
+# and newly published dates are appended to it without a full reload.
+data = dataset.current(snapshot.DATA_FILE, snapshot.DATA_SHEET)
+date_options = data.date_options()  # Needed for both modes
+
+# Filter results and serialised API responses, shared by all sessions
+@st.cache_resource
+def get_result_cache():
+    return QueryCache()
+
+result_cache = get_result_cache()
+
+def cached_export(dataset, query, fmt, page=Page(), orient="records", encoding=None):
+    """Serialised rows of ``query``, built on first request and then served from the cache."""
+    key = (fmt, query, page, orient) if fmt == "json" else (fmt, query, page)
+    if encoding:
+        body = result_cache.get(dataset.version, (*key, encoding))
+        if body is None:
+            body = compression.compress(cached_export(dataset, query, fmt, page, orient), encoding)
+            result_cache.put(dataset.version, (*key, encoding), body)
+        return body
+    body = result_cache.get(dataset.version, key)
+    if body is None:
+        total = None if page.is_full else len(result_cache.rows(dataset, query))
+        with metrics.span(f"export.{fmt}"):
+            body = export.to_bytes(dataset, result_cache.page(dataset, query, page), fmt, orient=orient, total=total)
+        result_cache.put(dataset.version, key, body)
+    return body
+
+# Plotly figures as JSON, shared by all sessions and bounded in size
+FIGURE_CACHE_ENTRIES = 64
+FIGURE_CACHE_BYTES = 64 * 1024 * 1024
+
+@st.cache_resource
+def get_figure_cache():
+    return QueryCache(max_entries=FIGURE_CACHE_ENTRIES, max_bytes=FIGURE_CACHE_BYTES)
+
+figure_cache = get_figure_cache()
+
+def build_figure(dataset, query, chart_type, by_date, max_series=None):
+    """Plotly figure of ``chart_type`` for ``query`` plus captions describing it."""
+    import plotly.express as px  # deferred until a chart is requested
+
+    # Totals per "ITEM | CURRENCY | RESIDUAL_MATURITY" label come from the
+    # pre-aggregated cube rather than grouping the filtered rows
+    captions = []
+    if by_date:
+        ts_data = label_totals(dataset, query, by_date=True)
+        if max_series is not None:
+            ts_data, plotted = charts.prepare_time_series(ts_data, max_series)
+            if plotted['shown'] < plotted['series']:
+                captions.append(
+                    f"Showing the {plotted['shown']} largest of {plotted['series']} series; "
+                    f"the rest are summed as '{charts.OTHER_LABEL}'."
+                )
+            if plotted['downsampled']:
+                captions.append(
+                    f"Long series are downsampled to {charts.MAX_POINTS} points each "
+                    f"({plotted['plotted']:,} of {plotted['points']:,} points plotted)."
+                )
+            render_mode = charts.render_mode(len(ts_data))
+        else:
+            render_mode = "auto"
+        with metrics.span("chart.figure"):
+            fig = px.line(
+                ts_data, x='OBS_DATE', y='AMOUNT', color='LABEL', title="Time Series",
+                markers=render_mode != "webgl", render_mode=render_mode
+            )
+        return fig, captions
+
+    chart_data = label_totals(dataset, query)
+    with metrics.span("chart.figure"):
+        if chart_type == "Bar":
+            fig = px.bar(chart_data, x='LABEL', y='AMOUNT', text_auto='.2s', title="Bar Chart")
+            fig.update_layout(xaxis_tickangle=-45)
+        elif chart_type == "Column":
+            fig = px.bar(chart_data, x='AMOUNT', y='LABEL', orientation='h', text_auto='.2s', title="Column Chart")
+        elif chart_type == "Line":
+            fig = px.line(chart_data, x='LABEL', y='AMOUNT', markers=True, title="Line Chart")
+            fig.update_layout(xaxis_tickangle=-45)
+        elif chart_type == "Pie":
+            fig = px.pie(chart_data, names='LABEL', values='AMOUNT', title="Pie Chart")
+    return fig, captions
+
+def cached_figure(dataset, query, chart_type, time_series_mode, max_series=None):
+    """Figure dict and captions of a chart, built on first request and then served from the cache.
+
+    Keyed by the dataset version, the normalised query and the chart settings,
+    so reruns caused by unrelated widgets (downloads, tabs, paging) skip the
+    aggregation and the figure construction.
+    """
+    by_date = time_series_mode and chart_type == "Line"
+    key = ("figure", query, chart_type, by_date, max_series if by_date else None)
+    cached = figure_cache.get(dataset.version, key)
+    if cached is None:
+        fig, captions = build_figure(dataset, query, chart_type, by_date, max_series)
+        cached = (fig.to_json().encode("utf-8"), tuple(captions))
+        figure_cache.put(dataset.version, key, cached)
+    spec, captions = cached
+    return json.loads(spec), captions
 
 st.title("📊 Data Dissemination Platform")
 
 # --- API Key Management ---
-def generate_api_key():
-    """Generate a unique API key"""
-    new_key = str(uuid.uuid4())
-    st.session_state.api_keys[new_key] = {
-        "created_at": datetime.datetime.now(),
-        "last_used": None,
-        "call_count": 0
-    }
-    return new_key
+# Keys persist in a SQLite store shared with api_server.py (hashes only)
+@st.cache_resource
+def get_key_store():
+    return KeyStore()
+
+def generate_api_key(limits=None):
+    """Generate a unique API key with the given rate limits"""
+    return get_key_store().create(limits)
 
 # --- Sidebar: Main Navigation ---
-app_mode = st.sidebar.radio("Mode", ["Data Explorer", "API Management"])
+app_mode = st.sidebar.radio("Mode", ["Data Explorer", "API Management", "Performance"])
 
 if app_mode == "Data Explorer":
     # --- Original data filtering and visualization functionality ---
@@ -63,14 +165,20 @@ if app_mode == "Data Explorer":
     time_series_mode = st.sidebar.checkbox("Enable Time-Series Mode (multiple dates)", value=False)
 
     if time_series_mode:
-        selected_dates = st.sidebar.multiselect("Select Dates", options=date_options)
+        date_selection = st.sidebar.radio("Date Selection", ["Specific dates", "Date range"], horizontal=True)
+        if date_selection == "Date range" and date_options:
+            # Answered as one contiguous slice of the date-sorted rows
+            start_date, end_date = st.sidebar.select_slider(
+                "Select Date Range",
+                options=date_options,
+                value=(date_options[0], date_options[-1]),
+                format_func=lambda x: x.strftime("%Y-%m-%d")
+            )
+            selected_dates = []
+        else:
+            start_date = end_date = None
+            selected_dates = st.sidebar.multiselect("Select Dates", options=date_options)
     else:
-        # Clean and convert date options
-        date_options = sorted([
-            d.to_pydatetime().date() if hasattr(d, 'to_pydatetime') else d
-            for d in df['OBS_DATE'].dropna().unique()
-            if isinstance(d, (datetime.date, datetime.datetime, pd.Timestamp))
-        ])
         # Guard clause
         if not date_options:
             st.sidebar.warning("No valid dates found in the dataset.")
@@ -84,116 +192,157 @@ if app_mode == "Data Explorer":
 
 
 
-    selected_item = st.sidebar.multiselect("Select Item", options=sorted(df['ITEM'].unique()))
-    selected_currency = st.sidebar.multiselect("Select Currency", options=sorted(df['CURRENCY'].unique()))
-    selected_maturity = st.sidebar.multiselect("Select Residual Maturity", options=sorted(df['RESIDUAL_MATURITY'].unique()))
+    selected_item = st.sidebar.multiselect("Select Item", options=data.options('ITEM'))
+    selected_currency = st.sidebar.multiselect("Select Currency", options=data.options('CURRENCY'))
+    selected_maturity = st.sidebar.multiselect("Select Residual Maturity", options=data.options('RESIDUAL_MATURITY'))
 
     chart_options = ["", "Bar", "Column", "Line", "Pie"]
     selected_chart_type = st.sidebar.selectbox("Select Chart Type", options=chart_options)
 
-    # --- Apply filters ---
-    filtered_df = df.copy()
+    # Time series can hold hundreds of labels; by default only the largest are drawn
+    adaptive_chart = time_series_mode and selected_chart_type == "Line" and st.sidebar.checkbox(
+        "Adaptive rendering", value=True,
+        help="Plot the largest series plus an 'Other' total, downsampled, using WebGL for large charts"
+    )
+    if adaptive_chart:
+        max_series = st.sidebar.slider("Series shown", min_value=5, max_value=50, value=charts.MAX_SERIES)
 
-    if time_series_mode and selected_dates:
-        filtered_df = filtered_df[filtered_df['OBS_DATE'].dt.date.isin(selected_dates)]
-    elif not time_series_mode and selected_date != "":
-        filtered_df = filtered_df[filtered_df['OBS_DATE'].dt.date == selected_date]
+    # --- Apply filters ---
+    date_range = (None, None)
+    if time_series_mode and start_date is not None:
+        filter_dates = None
+        date_range = (start_date, end_date)
+    elif time_series_mode and selected_dates:
+        filter_dates = selected_dates
+    elif not time_series_mode and selected_date is not None:
+        filter_dates = [selected_date]
     else:
-        filtered_df = pd.DataFrame()  # Empty until selection
+        filter_dates = None  # Empty until selection
+
+    query = Query(
+        dates=filter_dates,
+        items=selected_item or None,
+        currencies=selected_currency or None,
+        maturities=selected_maturity or None,
+        start=date_range[0],
+        end=date_range[1],
+    )
 
-    # Apply other filters
-    if not filtered_df.empty:
-        if selected_item:
-            filtered_df = filtered_df[filtered_df['ITEM'].isin(selected_item)]
-        if selected_currency:
-            filtered_df = filtered_df[filtered_df['CURRENCY'].isin(selected_currency)]
-        if selected_maturity:
-            filtered_df = filtered_df[filtered_df['RESIDUAL_MATURITY'].isin(selected_maturity)]
+    if query.has_dates:
+        filtered_rows = result_cache.rows(data, query)
+    else:
+        filtered_rows = []  # Empty until selection
 
     # --- Display Data Table ---
-    if not filtered_df.empty:
+    if len(filtered_rows):
         st.subheader("📄 Filtered Results")
-        st.dataframe(filtered_df[['CURRENCY', 'ITEM', 'OBS_DATE', 'RESIDUAL_MATURITY', 'AMOUNT']].reset_index(drop=True))
-        st.markdown(f"### ✅ Total Records: {len(filtered_df)}")
-
-        # Add label column for grouping
-        filtered_df['LABEL'] = (
-            filtered_df['ITEM'] + " | " +
-            filtered_df['CURRENCY'] + " | " +
-            filtered_df['RESIDUAL_MATURITY']
+
+        # Only the visible page is sorted, sliced and sent to the browser
+        total_records = len(filtered_rows)
+        col1, col2, col3, col4 = st.columns(4)
+        page_size = col1.selectbox("Rows per page", options=[25, 50, 100, 500], index=1)
+        sort_column = col2.selectbox("Sort by", options=["None"] + snapshot.COLUMNS)
+        sort_order = col3.selectbox("Order", options=["Ascending", "Descending"])
+        page_count = max(1, math.ceil(total_records / page_size))
+        page_number = col4.number_input(
+            f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, step=1,
+            key=f"page-{hash((query, page_size, sort_column, sort_order))}"
+        )
+        page = Page(
+            offset=(page_number - 1) * page_size,
+            limit=page_size,
+            sort=None if sort_column == "None" else sort_column,
+            descending=sort_order == "Descending",
         )
+        page_rows = result_cache.page(data, query, page)
+        with metrics.span("table.render"):
+            page_df = data.frame(page_rows)
+            page_df.index = range(page.offset + 1, page.offset + len(page_df) + 1)
+            st.dataframe(page_df)
+
+        amounts = data.columns['AMOUNT']
+        st.caption(
+            f"Rows {page.offset + 1:,}–{page.offset + len(page_rows):,} of {total_records:,} · "
+            f"AMOUNT on this page: {amounts[page_rows].sum():,.2f} · "
+            f"AMOUNT over all results: {amounts[filtered_rows].sum():,.2f}"
+        )
+        st.markdown(f"### ✅ Total Records: {total_records}")
 
         # --- Chart Display ---
         if selected_chart_type != "":
             st.subheader("📈 Amount Visualization")
-
-            if time_series_mode and selected_chart_type == "Line":
-                ts_data = filtered_df.groupby(['OBS_DATE', 'LABEL'])['AMOUNT'].sum().reset_index()
-                fig = px.line(ts_data, x='OBS_DATE', y='AMOUNT', color='LABEL', markers=True, title="Time Series")
-            else:
-                chart_data = filtered_df.groupby('LABEL')['AMOUNT'].sum().reset_index()
-                if selected_chart_type == "Bar":
-                    fig = px.bar(chart_data, x='LABEL', y='AMOUNT', text_auto='.2s', title="Bar Chart")
-                    fig.update_layout(xaxis_tickangle=-45)
-                elif selected_chart_type == "Column":
-                    fig = px.bar(chart_data, x='AMOUNT', y='LABEL', orientation='h', text_auto='.2s', title="Column Chart")
-                elif selected_chart_type == "Line":
-                    fig = px.line(chart_data, x='LABEL', y='AMOUNT', markers=True, title="Line Chart")
-                    fig.update_layout(xaxis_tickangle=-45)
-                elif selected_chart_type == "Pie":
-                    fig = px.pie(chart_data, names='LABEL', values='AMOUNT', title="Pie Chart")
-            
-            st.plotly_chart(fig, use_container_width=True)
+            # Built once per filter state and chart settings; other reruns reuse the figure
+            figure, captions = cached_figure(
+                data, query, selected_chart_type, time_series_mode,
+                max_series=max_series if adaptive_chart else None
+            )
+            for caption in captions:
+                st.caption(caption)
+            with metrics.span("chart.render"):
+                st.plotly_chart(figure, use_container_width=True)
         else:
             st.info("Please select a chart type to visualize the data.")
 
         # --- Download & API Section ---
-        if not filtered_df.empty:
+        if len(filtered_rows):
             st.markdown("### ⬇️ Download or Access Data")
             
             tab1, tab2 = st.tabs(["Download Data", "API Access"])
             
             with tab1:
-                col1, col2 = st.columns(2)
+                # Files are only generated when a button is clicked, then cached per query
+                col1, col2, col3 = st.columns(3)
 
                 with col1:
-                    csv = filtered_df.to_csv(index=False).encode('utf-8')
                     st.download_button(
                         label="Download as CSV",
-                        data=csv,
+                        data=partial(cached_export, data, query, "csv"),
                         file_name='filtered_data.csv',
                         mime='text/csv'
                     )
 
                 with col2:
-                    import tempfile
-                    with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-                        filtered_df.to_excel(tmp.name, index=False)
-                        tmp.seek(0)
+                    st.download_button(
+                        label="Download as Excel",
+                        data=partial(cached_export, data, query, "excel"),
+                        file_name="filtered_data.xlsx",
+                        mime=export.EXCEL_MIME
+                    )
+
+                with col3:
+                    # Repeated labels make CSV compress roughly tenfold
+                    st.download_button(
+                        label="Download as CSV (gzip)",
+                        data=partial(cached_export, data, query, "csv", encoding="gzip"),
+                        file_name='filtered_data.csv' + compression.FILE_SUFFIXES["gzip"],
+                        mime=compression.FILE_MIMES["gzip"]
+                    )
+
+                # Columnar formats for loading straight into pandas, Arrow or Spark
+                if arrow.available():
+                    col4, col5, _ = st.columns(3)
+
+                    with col4:
                         st.download_button(
-                            label="Download as Excel",
-                            data=tmp.read(),
-                            file_name="filtered_data.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                            label="Download as Parquet",
+                            data=partial(cached_export, data, query, "parquet"),
+                            file_name="filtered_data.parquet",
+                            mime=export.PARQUET_MIME
+                        )
+
+                    with col5:
+                        st.download_button(
+                            label="Download as Arrow",
+                            data=partial(cached_export, data, query, "arrow"),
+                            file_name="filtered_data.arrow",
+                            mime=export.ARROW_MIME
                         )
             
             with tab2:
                 st.subheader("Access this data via API")
                 
                 # Create query parameters from current filters
-                params = {}
-                
-                if time_series_mode and selected_dates:
-                    params['dates'] = ",".join([d.strftime("%Y-%m-%d") for d in selected_dates])
-                elif not time_series_mode and selected_date != "":
-                    params['date'] = selected_date.strftime("%Y-%m-%d") if selected_date else ""
-                
-                if selected_item:
-                    params['items'] = ",".join(selected_item)
-                if selected_currency:
-                    params['currencies'] = ",".join(selected_currency)
-                if selected_maturity:
-                    params['maturities'] = ",".join(selected_maturity)
+                params = query.to_params()
                 
                 # Build example API URL using the configured base URL
                 base_url = st.session_state.api_base_url
@@ -242,8 +391,13 @@ elif app_mode == "API Management":
     # API Key Generation Section
     st.subheader("Generate API Key")
     
+    col1, col2, col3 = st.columns(3)
+    rate = col1.number_input("Rate (tokens/second)", min_value=0.1, value=DEFAULT_RATE)
+    burst = col2.number_input("Burst (tokens)", min_value=1.0, value=DEFAULT_BURST)
+    daily_quota = col3.number_input("Daily quota (tokens)", min_value=1.0, value=DEFAULT_DAILY_QUOTA)
+    
     if st.button("Generate New API Key"):
-        new_key = generate_api_key()
+        new_key = generate_api_key(Limits(rate=rate, burst=burst, daily_quota=daily_quota))
         st.success("New API key generated!")
         st.code(new_key)
         st.warning("Save this key securely. It won't be shown again!")
@@ -251,14 +405,15 @@ elif app_mode == "API Management":
     # View existing API keys
     st.subheader("Your API Keys")
     
-    if not st.session_state.api_keys:
+    api_keys = get_key_store().list_keys()
+    if not api_keys:
         st.info("No API keys have been generated yet.")
     else:
         key_data = []
-        for key, data in st.session_state.api_keys.items():
-            masked_key = f"{key[:8]}...{key[-4:]}"
-            created_time = data['created_at']
-            last_used = data['last_used'] if data['last_used'] else "Never"
+        for key_info in api_keys:
+            masked_key = key_info['masked_key']
+            created_time = key_info['created_at']
+            last_used = key_info['last_used'] if key_info['last_used'] else "Never"
             
             # Format timestamps properly
             if isinstance(created_time, pd.Timestamp):
@@ -275,11 +430,24 @@ elif app_mode == "API Management":
                 "Key": masked_key,
                 "Created": created_str,
                 "Last Used": last_used_str,
-                "Usage Count": data['call_count']
+                "Usage Count": key_info['call_count'],
+                "Rate": f"{key_info['limits'].rate:g}/s",
+                "Burst": f"{key_info['limits'].burst:g}",
+                "Daily Quota": f"{key_info['limits'].daily_quota:g}"
             })
         
         st.table(pd.DataFrame(key_data))
     
+    # Result cache statistics
+    st.subheader("Query Cache")
+    
+    cache_stats = result_cache.stats()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Hits", cache_stats["hits"])
+    col2.metric("Misses", cache_stats["misses"])
+    col3.metric("Hit Rate", f"{cache_stats['hit_rate']:.0%}")
+    col4.metric("Cached", f"{cache_stats['entries']} ({cache_stats['bytes'] / 1e6:.1f} MB)")
+    
     # API Documentation
     st.subheader("API Documentation")
     
@@ -294,10 +462,17 @@ elif app_mode == "API Management":
     
     - `date` - Single date in YYYY-MM-DD format
     - `dates` - Multiple dates, comma-separated (YYYY-MM-DD,YYYY-MM-DD)
+    - `start`, `end` - Inclusive date range in YYYY-MM-DD format; either may be omitted
     - `items` - Filter by items, comma-separated
     - `currencies` - Filter by currencies, comma-separated
     - `maturities` - Filter by residual maturities, comma-separated
-    - `format` - Response format: json (default), csv, or excel
+    - `format` - Response format: json (default), csv, ndjson (one JSON object per line), excel,
+      arrow (Arrow IPC stream) or parquet; arrow and parquet keep ITEM, CURRENCY and
+      RESIDUAL_MATURITY dictionary-encoded and need pyarrow on the server
+    - `orient` - JSON layout: records (default, one object per row) or columns (one array per column)
+    - `sort` - Column to sort by; prefix with `-` for descending (e.g. `-AMOUNT`)
+    - `offset` - Number of rows to skip (default 0)
+    - `limit` - Maximum number of rows to return (default: all)
     
     **Headers:**
     
@@ -325,105 +500,118 @@ elif app_mode == "API Management":
       "timestamp": "2023-06-10T12:34:56Z"
     }
     ```
+    
+    When `offset`, `limit` or `sort` is given, `count` is the number of rows in the page and
+    `total` the number of rows matching the filters.
+    
+    #### `GET /api/aggregate`
+    
+    Returns AMOUNT aggregated on the server, for clients that only need totals. Takes the same
+    filter parameters as `/api/data`, plus:
+    
+    - `group_by` - Comma-separated subset of ITEM, CURRENCY, RESIDUAL_MATURITY and OBS_DATE
+      (default: none, a single grand total)
+    - `agg` - sum (default), mean, count, min or max
+    - `format` - json (default) or csv
+    
+    **Example Request:**
+    ```
+    GET /api/aggregate?dates=2023-01-15,2023-02-15&group_by=OBS_DATE,CURRENCY&agg=sum
+    ```
+    
+    Each record holds the `group_by` columns and the aggregated `AMOUNT`.
+    
+    **Compression:**
+    
+    JSON, NDJSON and CSV responses are compressed when the request sends `Accept-Encoding`
+    (`gzip`, plus `br` and `zstd` where the server has them installed). Most HTTP clients,
+    including `requests`, send it and decompress transparently.
+    
+    **Caching:**
+    
+    Every response carries an `ETag` that changes only when new data is published, plus
+    `Last-Modified` and `Cache-Control` headers. Send the ETag back in `If-None-Match` when
+    polling; if nothing changed the server answers `304 Not Modified` with an empty body.
+    
+    **Rate Limits:**
+    
+    Each request costs tokens from your key's bucket: one per request plus one per 1,000 rows
+    returned, four times that for `excel`. The bucket refills at the key's rate up to its burst
+    size, and the tokens spent per UTC day are capped by its daily quota. A request costing more
+    than the burst size is served when the bucket is full and leaves it in debt, so the next
+    request waits until the full price has been refilled. When a request does not fit, the server
+    answers `429 Too Many Requests` with a `Retry-After` header in seconds.
     """)
     
     # Server implementation instructions 
     with st.expander("Server Implementation Guide"):
         st.markdown("""
-        ### Implementing the API Server
+        ### Running the API Server
         
-        To expose this data through an API, you'll need to implement a server component. Here's how to implement this with FastAPI in Python:
+        The API is served by `api_server.py`, a FastAPI application in this repository. It loads the
+        dataset snapshot once at startup and answers every request from memory using the same filter
+        index as this app.
         
-        ```python
-        from fastapi import FastAPI, Header, HTTPException, Query
-        from fastapi.responses import JSONResponse, StreamingResponse
-        import pandas as pd
-        from typing import List, Optional
-        import io
+        ```bash
+        pip install -r requirements.txt
         
-        app = FastAPI()
+        # Keys generated on this page are read from the same key store
+        # (api_keys.sqlite3 in the working directory, or DATA_PLATFORM_KEY_DB)
         
-        # This would be stored in a database in production
-        API_KEYS = {
-            # Keys generated from the Streamlit app
-        }
+        # Optional: share rate-limit buckets between workers
+        export DATA_PLATFORM_RATE_LIMIT_DB=rate_limits.sqlite3
         
-        @app.get("/api/data")
-        async def get_data(
-            x_api_key: str = Header(None),
-            date: Optional[str] = None,
-            dates: Optional[str] = None,
-            items: Optional[str] = None,
-            currencies: Optional[str] = None,
-            maturities: Optional[str] = None,
-            format: str = "json"
-        ):
-            # Validate API key
-            if x_api_key not in API_KEYS:
-                raise HTTPException(status_code=401, detail="Invalid API key")
-                
-            # Update API key usage statistics
-            # In production, this would update a database
-            
-            # Load the same data source as your Streamlit app
-            df = pd.read_excel("your_data_file.xlsx", 2)
-            
-            # Apply the same cleaning
-            df['OBS_DATE'] = pd.to_datetime(df['OBS_DATE'], errors='coerce')
-            df['ITEM'] = df['ITEM'].astype(str)
-            df['CURRENCY'] = df['CURRENCY'].astype(str)
-            df['RESIDUAL_MATURITY'] = df['RESIDUAL_MATURITY'].astype(str)
-            df['AMOUNT'] = pd.to_numeric(df['AMOUNT'], errors='coerce')
-            df = df.dropna(subset=['OBS_DATE', 'ITEM', 'CURRENCY', 'RESIDUAL_MATURITY', 'AMOUNT'])
-            
-            # Apply filters
-            if date:
-                df = df[df['OBS_DATE'].dt.date == pd.to_datetime(date).date()]
-            
-            if dates:
-                date_list = [pd.to_datetime(d).date() for d in dates.split(",")]
-                df = df[df['OBS_DATE'].dt.date.isin(date_list)]
-                
-            if items:
-                item_list = items.split(",")
-                df = df[df['ITEM'].isin(item_list)]
-                
-            if currencies:
-                currency_list = currencies.split(",")
-                df = df[df['CURRENCY'].isin(currency_list)]
-                
-            if maturities:
-                maturity_list = maturities.split(",")
-                df = df[df['RESIDUAL_MATURITY'].isin(maturity_list)]
-            
-            # Return requested format
-            if format.lower() == "csv":
-                output = io.StringIO()
-                df.to_csv(output, index=False)
-                return StreamingResponse(
-                    io.BytesIO(output.getvalue().encode()),
-                    media_type="text/csv",
-                    headers={"Content-Disposition": "attachment; filename=data.csv"}
-                )
-            elif format.lower() == "excel":
-                output = io.BytesIO()
-                df.to_excel(output, index=False)
-                return StreamingResponse(
-                    output,
-                    media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    headers={"Content-Disposition": "attachment; filename=data.xlsx"}
-                )
-            else:  # json is default
-                return {
-                    "data": df.to_dict(orient="records"),
-                    "count": len(df),
-                    "timestamp": pd.Timestamp.now().isoformat()
-                }
-        
-        # Run with: uvicorn api_server:app --reload
+        # One worker per CPU by default; all workers share the memory-mapped snapshot
+        python api_server.py --port 8000 --workers 4
         ```
+        
+        `python api_server.py` ingests and indexes the workbook once before the workers
+        start. Started directly with `uvicorn api_server:app --workers 4`, every worker
+        parses the workbook and builds the index itself when the snapshot is missing or
+        out of date, so prefer `python api_server.py` for several workers.
+        
+        Each worker exposes its request latencies, stage timings and cache counters at
+        `GET /metrics` in the Prometheus text format, for scraping without an API key.
         """)
 
+elif app_mode == "Performance":
+    st.header("Performance")
+    st.caption(
+        "Timings of the instrumented stages in this app process since it started or was last reset. "
+        "Percentiles cover the most recent observations of each stage."
+    )
+
+    spans = metrics.REGISTRY.spans()
+    if spans:
+        timings = pd.DataFrame(spans).set_index("span")
+        timings[["total", "mean", "max", "p50", "p90", "p99"]] *= 1000
+        st.subheader("Stage Timings (ms)")
+        st.dataframe(timings[["count", "mean", "p50", "p90", "p99", "max", "total"]].round(2))
+    else:
+        st.info("No timings recorded yet. Use the Data Explorer to generate some.")
+
+    st.subheader("Caches")
+    st.dataframe(
+        pd.DataFrame([result_cache.stats(), figure_cache.stats()], index=["Results", "Figures"])
+    )
+
+    counters = metrics.REGISTRY.counters()
+    if counters:
+        st.subheader("Counters")
+        st.dataframe(pd.Series(counters, name="count").rename_axis("event"))
+
+    gauges = {
+        f"{cache}_cache_{name}": value
+        for cache, stats in (("result", result_cache.stats()), ("figure", figure_cache.stats()))
+        for name, value in stats.items()
+    }
+    with st.expander("Prometheus export"):
+        st.code(metrics.REGISTRY.prometheus(gauges=gauges), language="text")
+
+    if st.button("Reset Metrics"):
+        metrics.REGISTRY.reset()
+        st.rerun()
+
 # If you want to handle API requests directly in this Streamlit app (simulated API endpoint)
 # Note: This is not a real API but can demonstrate the functionality
 if "api_request" in st.query_params:
@@ -440,52 +628,34 @@ if "api_request" in st.query_params:
     params = st.query_params
     format_param = params.get("format", "json")
     
-    # Apply filters similar to the main app
-    filtered_api_df = df.copy()
-    
-    # Apply date filter
-    if "date" in params:
-        try:
-            date_param = pd.to_datetime(params["date"]).date()
-            filtered_api_df = filtered_api_df[filtered_api_df['OBS_DATE'].dt.date == date_param]
-        except:
-            pass
-    
-    if "dates" in params:
-        try:
-            date_list = [pd.to_datetime(d).date() for d in params["dates"].split(",")]
-            filtered_api_df = filtered_api_df[filtered_api_df['OBS_DATE'].dt.date.isin(date_list)]
-        except:
-            pass
-    
-    # Apply other filters
-    if "items" in params:
-        item_list = params["items"].split(",")
-        filtered_api_df = filtered_api_df[filtered_api_df['ITEM'].isin(item_list)]
-    
-    if "currencies" in params:
-        currency_list = params["currencies"].split(",")
-        filtered_api_df = filtered_api_df[filtered_api_df['CURRENCY'].isin(currency_list)]
-    
-    if "maturities" in params:
-        maturity_list = params["maturities"].split(",")
-        filtered_api_df = filtered_api_df[filtered_api_df['RESIDUAL_MATURITY'].isin(maturity_list)]
+    # Apply filters through the same index and cache as the main app
+    api_query = Query.from_params(params)
+    try:
+        api_page = Page.from_params(params)
+    except ValueError as exc:
+        st.error(f"Invalid paging parameters: {exc}")
+        st.stop()
     
     # Return data in requested format
     if format_param == "csv":
-        csv = filtered_api_df.to_csv(index=False)
+        csv = cached_export(data, api_query, "csv", api_page)
         st.download_button("Download CSV", csv, "data.csv", "text/csv")
+    elif format_param == "ndjson":
+        ndjson = cached_export(data, api_query, "ndjson", api_page)
+        st.download_button("Download NDJSON", ndjson, "data.ndjson", export.NDJSON_MIME)
     elif format_param == "excel":
-        excel_buffer = BytesIO()
-        filtered_api_df.to_excel(excel_buffer, index=False)
-        excel_data = excel_buffer.getvalue()
-        st.download_button("Download Excel", excel_data, "data.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        excel_data = cached_export(data, api_query, "excel", api_page)
+        st.download_button("Download Excel", excel_data, "data.xlsx", export.EXCEL_MIME)
+    elif format_param == "arrow" and arrow.available():
+        arrow_data = cached_export(data, api_query, "arrow", api_page)
+        st.download_button("Download Arrow", arrow_data, "data.arrow", export.ARROW_MIME)
+    elif format_param == "parquet" and arrow.available():
+        parquet_data = cached_export(data, api_query, "parquet", api_page)
+        st.download_button("Download Parquet", parquet_data, "data.parquet", export.PARQUET_MIME)
     else:  # json is default
-        st.json({
-            "data": filtered_api_df.to_dict(orient="records"),
-            "count": len(filtered_api_df),
-            "timestamp": pd.Timestamp.now().isoformat()
-        })
+        orient = "columns" if params.get("orient") == "columns" else "records"
+        body = cached_export(data, api_query, "json", api_page, orient)
+        st.json(body.decode('utf-8'))
 
 
 # In[ ]:
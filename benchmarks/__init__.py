@@ -0,0 +1,5 @@
+"""Benchmark suite: synthetic datasets and timings of the data-layer hot paths.
+
+Run from the repository root with ``python -m benchmarks.run``; see
+``benchmarks/run.py`` for the options and the result format.
+"""
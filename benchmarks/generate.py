@@ -0,0 +1,144 @@
+"""Synthetic datasets with the schema and shape of the reserves workbook.
+
+Rows follow the workbook layout: one series per ITEM / CURRENCY /
+RESIDUAL_MATURITY combination, listed series by series with one row per
+observation date. Series are added over time, so the earliest dates hold
+fewer rows, and a share of series is constantly zero, as in the real sheet.
+Generation is deterministic for a given profile and seed.
+
+    python -m benchmarks.generate 1m --output synthetic.xlsx
+"""
+
+import argparse
+import math
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from dataplatform.snapshot import COLUMNS, DATA_SHEET
+
+# Rows a worksheet can hold below its header row
+EXCEL_MAX_ROWS = 1_048_575
+
+CURRENCIES = [
+    "EURO", "US DOLLAR", "POUND STERLING", "JAPANESE YEN", "SWISS FRANC", "CHINESE YUAN RENMINBI",
+    "CANADIAN DOLLAR", "AUSTRALIAN DOLLAR", "SWEDISH KRONA", "NORWEGIAN KRONE", "DANISH KRONE",
+    "SINGAPORE DOLLAR", "HONG KONG DOLLAR", "NEW ZEALAND DOLLAR", "KOREAN WON", "POLISH ZLOTY",
+]
+MATURITIES = [
+    "NOT APPLICABLE", "UP TO 1 MONTH", "OVER 1 AND UP TO 3 MONTHS", "OVER 3 MONTHS AND UP TO 1 YEAR",
+    "TOTAL", "OVER 1 YEAR AND UP TO 5 YEARS", "OVER 5 YEARS AND UP TO 10 YEARS", "OVER 10 YEARS",
+]
+ITEM_GROUPS = [
+    "RESERVE ASSETS : MONETARY GOLD (INCLUDING GOLD DEPOSITS AND GOLD SWAPS)",
+    "RESERVE ASSETS : SECURITIES : DEBT SECURITIES ISSUED BY GENERAL GOVERNMENT",
+    "RESERVE ASSETS : CURRENCY AND DEPOSITS : WITH OTHER CENTRAL BANKS, THE BIS AND THE IMF",
+    "RESERVE ASSETS : RESERVE POSITION IN THE IMF",
+    "OTHER FOREIGN CURRENCY ASSETS : SECURITIES NOT INCLUDED IN OFFICIAL RESERVE ASSETS",
+    "PREDETERMINED SHORT-TERM NET DRAINS : LOANS, SECURITIES AND DEPOSITS : OUTFLOWS",
+    "CONTINGENT SHORT-TERM NET DRAINS : UNDRAWN CREDIT LINES PROVIDED TO OTHER CENTRAL BANKS",
+    "MEMO ITEMS : FINANCIAL DERIVATIVES (NET, MARKED TO MARKET) : FORWARDS",
+]
+
+# Share of series whose AMOUNT is always zero
+ZERO_SERIES = 0.4
+
+
+@dataclass(frozen=True)
+class Profile:
+    """Row count and dimension cardinalities of a synthetic dataset."""
+
+    rows: int
+    items: int
+    currencies: int
+    maturities: int
+    dates: int
+    freq: str = "ME"  # pandas frequency of the observation dates
+    last_date: str = "2024-12-31"
+
+    def __post_init__(self):
+        series = math.ceil(self.rows / self.dates)
+        if self.rows < 1 or series > self.items * self.currencies * self.maturities:
+            raise ValueError("rows must be positive and fit in items x currencies x maturities x dates")
+        if self.maturities > len(MATURITIES):
+            raise ValueError(f"at most {len(MATURITIES)} maturities")
+
+
+# About 280 series per month-end, as in the workbook, growing with the size
+PROFILES = {
+    "10k": Profile(10_000, items=88, currencies=2, maturities=5, dates=36),
+    "1m": Profile(1_000_000, items=400, currencies=8, maturities=6, dates=240),
+    "10m": Profile(10_000_000, items=1_500, currencies=20, maturities=8, dates=1_000, freq="B"),
+}
+
+
+def _labels(profile):
+    items = [
+        f"{ITEM_GROUPS[i % len(ITEM_GROUPS)]} : SERIES {i // len(ITEM_GROUPS) + 1:04d}"
+        for i in range(profile.items)
+    ]
+    currencies = [
+        CURRENCIES[i] if i < len(CURRENCIES) else f"CURRENCY {i + 1:03d}"
+        for i in range(profile.currencies)
+    ]
+    return items, currencies, MATURITIES[:profile.maturities]
+
+
+def generate(profile, seed=0):
+    """DataFrame of ``profile.rows`` rows; dimensions are categoricals."""
+    rng = np.random.default_rng(seed)
+    items, currencies, maturities = _labels(profile)
+    dates = pd.date_range(end=profile.last_date, periods=profile.dates, freq=profile.freq)
+
+    # Distinct series, each an (item, currency, maturity) combination
+    series = math.ceil(profile.rows / profile.dates)
+    combos = rng.choice(profile.items * profile.currencies * profile.maturities, series, replace=False)
+    item, rest = np.divmod(np.sort(combos), profile.currencies * profile.maturities)
+    currency, maturity = np.divmod(rest, profile.maturities)
+
+    # Random walks around a per-series level
+    level = rng.lognormal(0.0, 1.0, series) * rng.choice([-1.0, 1.0], series, p=[0.1, 0.9])
+    steps = rng.normal(0.0, 0.02, (series, profile.dates)) * np.abs(level)[:, None]
+    amount = level[:, None] + np.cumsum(steps, axis=1)
+    amount[rng.random(series) < ZERO_SERIES] = 0.0
+
+    # Drop the surplus cells from the earliest dates: series join over time
+    observed = np.ones((series, profile.dates), dtype=bool)
+    surplus = np.arange(series * profile.dates - profile.rows)
+    joining = rng.permutation(series)
+    observed[joining[surplus % series], surplus // series] = False
+
+    series_index, date_index = np.nonzero(observed)  # series by series, dates ascending
+    return pd.DataFrame({
+        'CURRENCY': pd.Categorical.from_codes(currency[series_index], currencies),
+        'ITEM': pd.Categorical.from_codes(item[series_index], items),
+        'OBS_DATE': dates[date_index],
+        'RESIDUAL_MATURITY': pd.Categorical.from_codes(maturity[series_index], maturities),
+        'AMOUNT': amount[series_index, date_index],
+    }, columns=COLUMNS)
+
+
+def write_workbook(df, path, sheet=DATA_SHEET):
+    """Write ``df`` as sheet index ``sheet`` of a workbook, like the source file."""
+    if len(df) > EXCEL_MAX_ROWS:
+        raise ValueError(f"a worksheet holds at most {EXCEL_MAX_ROWS:,} rows")
+    with pd.ExcelWriter(path) as writer:
+        for i in range(sheet):
+            pd.DataFrame().to_excel(writer, sheet_name=f"Sheet{i + 1}")
+        df.to_excel(writer, sheet_name="Data", index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("size", choices=sorted(PROFILES))
+    parser.add_argument("--output", required=True, help="workbook path (.xlsx)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    df = generate(PROFILES[args.size], args.seed)
+    write_workbook(df, args.output)
+    print(f"Wrote {len(df):,} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
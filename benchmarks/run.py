@@ -0,0 +1,282 @@
+"""Time the data-layer hot paths on synthetic datasets and store the results as JSON.
+
+    python -m benchmarks.run                        # 10k and 1m rows
+    python -m benchmarks.run --sizes 10k 1m 10m --repeat 10
+    python -m benchmarks.run --compare benchmarks/results/OLD.json benchmarks/results/NEW.json
+
+Per size, the suite times loading (workbook ingest, snapshot encoding, index
+and cube build, attaching to a stored snapshot), every combination of the
+date / item / currency / maturity filters, the chart and aggregate roll-ups
+and every export format. Each benchmark runs ``--repeat`` times after one
+untimed warm-up run (none for the load benchmarks, which are cold by
+definition). The result file records min/median/mean/max seconds per
+benchmark with the commit, package versions and machine, and ``--compare``
+reports the change in median between two such files. Only compare results
+recorded on the same machine.
+"""
+
+import argparse
+import datetime
+import hashlib
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.generate import PROFILES, generate, write_workbook
+from dataplatform import arrow, export, snapshot
+from dataplatform.cube import CUBE_DIMENSIONS, aggregate, label_totals
+from dataplatform.dataset import Dataset
+from dataplatform.query import Query
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Larger workbooks take minutes to write and parse; their load is timed from the frame only
+MAX_WORKBOOK_ROWS = 100_000
+
+# Exports cover the most recent EXPORT_DATES observation dates
+EXPORT_DATES = 12
+
+# A change smaller than this many seconds is never reported as a regression
+MIN_DELTA = 0.001
+
+
+def _git(*args):
+    try:
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(RESULTS_DIR),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _environment():
+    packages = {"numpy": np.__version__, "pandas": pd.__version__}
+    if arrow.available():
+        arrow.require_pyarrow()
+        packages["pyarrow"] = arrow.pa.__version__
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD") or "unknown",
+        "dirty": bool(status),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "packages": packages,
+    }
+
+
+def _measure(run, repeat, warmup=True, setup=None):
+    """Seconds per call of ``run()``; ``setup()`` runs untimed before each call."""
+    if warmup:
+        if setup:
+            setup()
+        run()
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return {
+        "min": min(timings),
+        "median": float(np.median(timings)),
+        "mean": float(np.mean(timings)),
+        "max": max(timings),
+        "runs": repeat,
+    }
+
+
+def _queries(data):
+    """Every combination of one date, item, currency and maturity, plus date lists and ranges.
+
+    The values are those of the last row, so every combination matches it.
+    """
+    last = len(data) - 1  # rows are sorted by date, so this is on the latest date
+    values = {
+        "date": ("dates", data.date_options()[-1:]),
+        "item": ("items", [data.vocab['ITEM'][data.columns['ITEM'][last]]]),
+        "currency": ("currencies", [data.vocab['CURRENCY'][data.columns['CURRENCY'][last]]]),
+        "maturity": ("maturities", [data.vocab['RESIDUAL_MATURITY'][data.columns['RESIDUAL_MATURITY'][last]]]),
+    }
+    queries = {}
+    for size in range(len(values) + 1):
+        for names in itertools.combinations(values, size):
+            queries["+".join(names) or "none"] = Query(**dict(values[name] for name in names))
+    dates = data.date_options()
+    queries["dates3"] = Query(dates=dates[-3:])
+    queries["range"] = Query(start=dates[len(dates) * 3 // 4], end=dates[-1])
+    return queries
+
+
+def _load_benchmarks(df, profile_name, seed, repeat, directory, max_workbook_rows):
+    results = {}
+    if len(df) <= max_workbook_rows:
+        workbook = os.path.join(directory, "synthetic.xlsx")
+        write_workbook(df, workbook)
+        target = os.path.join(directory, "ingest")
+        results["load.workbook"] = _measure(
+            lambda: snapshot.ingest(workbook, snapshot.DATA_SHEET, target),
+            repeat, warmup=False, setup=lambda: shutil.rmtree(target, ignore_errors=True),
+        )
+
+    digest = hashlib.sha256(f"{profile_name}-{seed}".encode()).hexdigest()
+    manifest = {
+        "version": f"synthetic-{profile_name}-{seed}",
+        "source": {"path": None, "sheet": None, "mtime_ns": time.time_ns(), "size": 0, "sha256": digest},
+    }
+    target = os.path.join(directory, "encode")
+    results["load.encode"] = _measure(
+        lambda: snapshot.write_frame(df, manifest, target),
+        repeat, warmup=False, setup=lambda: shutil.rmtree(target, ignore_errors=True),
+    )
+
+    derived = os.path.join(target, manifest["version"], snapshot.DERIVED)
+    results["load.build"] = _measure(
+        lambda: Dataset.load(manifest["version"], target),
+        repeat, warmup=False, setup=lambda: shutil.rmtree(derived, ignore_errors=True),
+    )
+    results["load.attach"] = _measure(lambda: Dataset.load(manifest["version"], target), repeat, warmup=False)
+    return results, Dataset.load(manifest["version"], target)
+
+
+def run_size(profile_name, seed=0, repeat=5, max_workbook_rows=MAX_WORKBOOK_ROWS, log=print):
+    """All benchmarks of one profile, as ``{"profile", "rows", "benchmarks"}``."""
+    profile = PROFILES[profile_name]
+    df = generate(profile, seed)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="dataplatform-bench-") as directory:
+        log(f"[{profile_name}] loading {len(df):,} rows")
+        loads, data = _load_benchmarks(df, profile_name, seed, repeat, directory, max_workbook_rows)
+        results.update(loads)
+        del df
+
+        log(f"[{profile_name}] filters")
+        for name, query in _queries(data).items():
+            results[f"filter.{name}"] = {
+                **_measure(lambda: data.rows(query), repeat),
+                "result_rows": len(data.rows(query)),
+            }
+
+        log(f"[{profile_name}] charts and aggregates")
+        dates = data.date_options()
+        latest = Query(dates=dates[-1:])
+        recent = Query(start=dates[-EXPORT_DATES:][0], end=dates[-1])
+        results["chart.totals"] = _measure(lambda: label_totals(data, latest), repeat)
+        results["chart.totals_by_date"] = _measure(lambda: label_totals(data, recent, by_date=True), repeat)
+        for dim in CUBE_DIMENSIONS:
+            results[f"aggregate.{dim}"] = _measure(lambda: aggregate(data, Query(), (dim,)), repeat)
+        results["aggregate.CURRENCY+OBS_DATE"] = _measure(
+            lambda: aggregate(data, Query(), ("CURRENCY", "OBS_DATE")), repeat
+        )
+
+        log(f"[{profile_name}] exports")
+        rows = data.rows(recent)
+        formats = ["json", "ndjson", "csv", "excel"] + (["arrow", "parquet"] if arrow.available() else [])
+        for fmt in formats:
+            results[f"export.{fmt}"] = {
+                **_measure(lambda: export.to_bytes(data, rows, fmt), repeat),
+                "result_rows": len(rows),
+                "bytes": len(export.to_bytes(data, rows, fmt)),
+            }
+        del data
+    return {"profile": vars(profile), "rows": profile.rows, "benchmarks": results}
+
+
+def compare(old, new, threshold=0.1, min_delta=MIN_DELTA):
+    """Median seconds of the benchmarks both results share, and which regressed.
+
+    A benchmark regressed when its median grew by more than ``threshold``
+    (relative) and ``min_delta`` seconds.
+    """
+    records = []
+    for size, new_size in new["sizes"].items():
+        old_size = old["sizes"].get(size)
+        if old_size is None:
+            continue
+        for name, timing in new_size["benchmarks"].items():
+            if name not in old_size["benchmarks"]:
+                continue
+            before, after = old_size["benchmarks"][name]["median"], timing["median"]
+            change = after / before - 1 if before else 0.0
+            records.append({
+                "size": size,
+                "benchmark": name,
+                "old_ms": before * 1000,
+                "new_ms": after * 1000,
+                "change": change,
+                "regression": change > threshold and after - before > min_delta,
+            })
+    return pd.DataFrame(records, columns=["size", "benchmark", "old_ms", "new_ms", "change", "regression"])
+
+
+def _print_comparison(old, new, table):
+    print(f"{old['environment']['commit']} -> {new['environment']['commit']}")
+    if old["environment"]["platform"] != new["environment"]["platform"]:
+        print("Warning: results were recorded on different platforms")
+    formatted = table.assign(
+        old_ms=table["old_ms"].map("{:,.3f}".format),
+        new_ms=table["new_ms"].map("{:,.3f}".format),
+        change=table["change"].map("{:+.1%}".format),
+        regression=table["regression"].map({True: "REGRESSION", False: ""}),
+    )
+    print(formatted.to_string(index=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", choices=sorted(PROFILES), default=["10k", "1m"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-workbook-rows", type=int, default=MAX_WORKBOOK_ROWS,
+                        help="largest size whose workbook ingest is timed")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="compare two result files instead of running the benchmarks")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative slowdown reported as a regression by --compare")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as fh:
+            old = json.load(fh)
+        with open(args.compare[1], encoding="utf-8") as fh:
+            new = json.load(fh)
+        table = compare(old, new, args.threshold)
+        _print_comparison(old, new, table)
+        sys.exit(1 if table["regression"].any() else 0)
+
+    environment = _environment()
+    result = {
+        "environment": environment,
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "sizes": {
+            size: run_size(size, args.seed, args.repeat, args.max_workbook_rows)
+            for size in args.sizes
+        },
+    }
+    output = args.output
+    if output is None:
+        suffix = "-dirty" if environment["dirty"] else ""
+        output = os.path.join(RESULTS_DIR, f"{environment['commit']}{suffix}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(result, fh, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Data layer shared by the Streamlit app and the API server."""
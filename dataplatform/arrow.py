@@ -0,0 +1,107 @@
+"""Arrow IPC stream and Parquet export for bulk consumers.
+
+Columns are handed to Arrow straight from the dataset arrays: dimensions as
+dictionary arrays over the int32 codes and the vocabulary, OBS_DATE as date32
+over the int32 day numbers and AMOUNT as float64. When the selected rows are
+a contiguous range (e.g. the full history) the memory-mapped arrays are
+wrapped without copying. Both formats are streamed, one record batch or row
+group at a time.
+
+``pyarrow`` is an optional dependency, imported on first use so it stays off
+the startup path; ``require_pyarrow`` raises a clear ImportError when it is
+missing.
+"""
+
+import importlib.util
+
+import numpy as np
+
+from dataplatform.snapshot import COLUMNS, DIMENSIONS
+from dataplatform.streams import Sink
+
+pa = None  # pyarrow, once imported by require_pyarrow
+
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+PARQUET_MIME = "application/vnd.apache.parquet"
+
+BATCH_ROWS = 65_536
+ROW_GROUP_ROWS = 1_000_000
+
+
+def available():
+    return pa is not None or importlib.util.find_spec("pyarrow") is not None
+
+
+def require_pyarrow():
+    global pa
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError(
+                "Arrow and Parquet output need the optional pyarrow package (pip install pyarrow)"
+            ) from None
+        pa = pyarrow
+
+
+def _take(values, rows):
+    """``values[rows]``, as a view when ``rows`` is a contiguous ascending range."""
+    values = np.asarray(values)
+    if len(rows) and rows[-1] - rows[0] + 1 == len(rows) and (np.diff(rows) == 1).all():
+        return values[rows[0]:rows[-1] + 1]
+    return values[rows]
+
+
+def schema():
+    require_pyarrow()
+    fields = []
+    for col in COLUMNS:
+        if col in DIMENSIONS:
+            fields.append(pa.field(col, pa.dictionary(pa.int32(), pa.string())))
+        elif col == 'OBS_DATE':
+            fields.append(pa.field(col, pa.date32()))
+        else:
+            fields.append(pa.field(col, pa.float64()))
+    return pa.schema(fields)
+
+
+def _record_batches(dataset, rows, batch_rows):
+    """Arrow record batches of the selected rows, sharing one dictionary per dimension."""
+    dictionaries = {dim: pa.array(dataset.vocab[dim].tolist(), pa.string()) for dim in DIMENSIONS}
+    target = schema()
+    for start in range(0, max(len(rows), 1), batch_rows):
+        batch = rows[start:start + batch_rows]
+        arrays = []
+        for col in COLUMNS:
+            values = _take(dataset.columns[col], batch)
+            if col in DIMENSIONS:
+                arrays.append(pa.DictionaryArray.from_arrays(pa.array(values), dictionaries[col]))
+            elif col == 'OBS_DATE':
+                arrays.append(pa.array(values).view(pa.date32()))
+            else:
+                arrays.append(pa.array(values))
+        yield pa.RecordBatch.from_arrays(arrays, schema=target)
+
+
+def iter_arrow(dataset, rows, batch_rows=BATCH_ROWS):
+    """Stream the selected rows in the Arrow IPC streaming format."""
+    require_pyarrow()
+    sink = Sink()
+    with pa.ipc.new_stream(sink, schema()) as writer:
+        for batch in _record_batches(dataset, rows, batch_rows):
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def iter_parquet(dataset, rows, row_group_rows=ROW_GROUP_ROWS):
+    """Stream the selected rows as a Parquet file, one row group at a time."""
+    require_pyarrow()
+    sink = Sink()
+    with pa.parquet.ParquetWriter(sink, schema()) as writer:
+        for batch in _record_batches(dataset, rows, row_group_rows):
+            writer.write_batch(batch, row_group_size=row_group_rows)
+            yield sink.drain()
+    yield sink.drain()
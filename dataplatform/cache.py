@@ -0,0 +1,129 @@
+"""Bounded LRU/TTL cache for filter results and serialised responses.
+
+Entries are keyed by ``(kind, query, *extra)`` within one dataset version,
+so a published snapshot is never answered from stale results. Entries of
+older versions are not dropped eagerly: requests still holding the previous
+dataset (deferred downloads, API requests in flight during a swap) keep
+using them, and they age out through the LRU and TTL bounds.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Streams larger than this are sent but not kept
+MAX_ENTRY_BYTES = 16 * 1024 * 1024
+
+
+def _size(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, tuple):
+        return sum(_size(item) for item in value)
+    return 0
+
+
+class QueryCache:
+    """Thread-safe LRU cache bounded by entry count, total bytes and age."""
+
+    def __init__(self, max_entries=512, max_bytes=256 * 1024 * 1024, ttl=3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _pop(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, version, key):
+        key = (version, key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] > self.ttl:
+                self._pop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, version, key, value):
+        size = _size(value)
+        key = (version, key)
+        with self._lock:
+            if size > self.max_bytes:
+                return
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = (value, time.monotonic(), size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def rows(self, dataset, query):
+        """Row positions matching ``query``, from cache when possible."""
+        key = ("rows", query)
+        rows = self.get(dataset.version, key)
+        if rows is None:
+            rows = dataset.rows(query)
+            rows.setflags(write=False)
+            self.put(dataset.version, key, rows)
+        return rows
+
+    def page(self, dataset, query, page):
+        """Rows of ``query`` in the window described by ``page``.
+
+        The sorted order of the whole result is cached, so moving between
+        pages only slices it.
+        """
+        rows = self.rows(dataset, query)
+        if page.sort is not None:
+            key = ("sorted", query, page.sort, page.descending)
+            ordered = self.get(dataset.version, key)
+            if ordered is None:
+                ordered = dataset.sort(rows, page.sort, page.descending)
+                ordered.setflags(write=False)
+                self.put(dataset.version, key, ordered)
+            rows = ordered
+        return page.apply(rows)
+
+    def stream(self, version, key, chunks, max_entry_bytes=MAX_ENTRY_BYTES):
+        """Pass ``chunks`` through, caching the joined bytes if they stay small."""
+        kept, size = [], 0
+        for chunk in chunks:
+            if kept is not None:
+                size += len(chunk)
+                if size <= max_entry_bytes:
+                    kept.append(chunk)
+                else:
+                    kept = None
+            yield chunk
+        if kept is not None:
+            self.put(version, key, b"".join(kept))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
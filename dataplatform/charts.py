@@ -0,0 +1,108 @@
+"""Adaptive preparation of time-series line charts.
+
+Without an item or currency filter a time series has one line per
+``ITEM | CURRENCY | RESIDUAL_MATURITY`` label, hundreds of them, and one
+point per date. :func:`prepare_time_series` keeps the labels with the largest
+absolute AMOUNT and sums the rest into one "Other" series, then thins each
+series with Largest-Triangle-Three-Buckets (LTTB), which keeps the peaks and
+troughs a fixed stride would drop. :func:`render_mode` switches plotly to
+WebGL (``scattergl``) traces once the figure holds many points.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Series drawn individually; the rest are summed into OTHER_LABEL
+MAX_SERIES = 15
+OTHER_LABEL = "Other"
+
+# Points kept per series
+MAX_POINTS = 500
+
+# Figures with more points than this are drawn with WebGL instead of SVG
+WEBGL_POINTS = 2_000
+
+
+def lttb(x, y, points):
+    """Indices of the ``points`` samples of ``(x, y)`` chosen by LTTB.
+
+    ``x`` must be ascending. The first and last samples are always kept;
+    series of at most ``points`` samples are returned whole.
+    """
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Bucket edges of the samples between the first and the last
+    edges = np.arange(points - 1) * (n - 2) // (points - 2) + 1
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(points - 2):
+        start, stop = edges[i], edges[i + 1]
+        # Third vertex: mean of the next bucket, or the last sample
+        following = slice(stop, edges[i + 2]) if i + 2 < len(edges) else slice(n - 1, n)
+        next_x, next_y = x[following].mean(), y[following].mean()
+        # Keep the sample spanning the largest triangle with the previous pick
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (next_y - y[previous])
+        )
+        previous = start + int(areas.argmax())
+        selected[i + 1] = previous
+    return selected
+
+
+def top_series(frame, max_series=MAX_SERIES, label='LABEL', x='OBS_DATE'):
+    """Keep the ``max_series`` labels with the largest absolute AMOUNT and sum the rest.
+
+    The summed labels become one OTHER_LABEL series per ``x``. Rows are
+    returned series by series, largest first and "Other" last.
+    """
+    weights = frame['AMOUNT'].abs().groupby(frame[label]).sum()
+    if len(weights) <= max_series:
+        return frame
+    ranked = weights.nlargest(max_series).index
+    top = frame[frame[label].isin(ranked)].copy()
+    top['_rank'] = top[label].map({value: i for i, value in enumerate(ranked)})
+    other = (
+        frame[~frame[label].isin(ranked)]
+        .groupby(x, as_index=False)['AMOUNT'].sum()
+        .assign(**{label: OTHER_LABEL, '_rank': len(ranked)})
+    )
+    combined = pd.concat([top, other[top.columns]], ignore_index=True)
+    return combined.sort_values(['_rank', x], kind='stable').drop(columns='_rank').reset_index(drop=True)
+
+
+def downsample(frame, max_points=MAX_POINTS, label='LABEL', x='OBS_DATE'):
+    """Thin every ``label`` series to at most ``max_points`` points with :func:`lttb`."""
+    if len(frame) <= max_points:
+        return frame
+    keep = []
+    for positions in frame.groupby(label, sort=False).indices.values():
+        positions = positions[np.argsort(frame[x].to_numpy()[positions], kind='stable')]
+        xs = frame[x].to_numpy()[positions].astype(np.int64)
+        keep.append(positions[lttb(xs, frame['AMOUNT'].to_numpy()[positions], max_points)])
+    return frame.iloc[np.sort(np.concatenate(keep))].reset_index(drop=True)
+
+
+def prepare_time_series(frame, max_series=MAX_SERIES, max_points=MAX_POINTS):
+    """Capped and downsampled copy of ``label_totals(..., by_date=True)`` for plotting.
+
+    Returns the frame and a summary: the number of ``series`` and ``points``
+    before, of series ``shown`` individually and points ``plotted`` after,
+    and whether any series was ``downsampled``.
+    """
+    series = frame['LABEL'].nunique()
+    summary = {'series': series, 'points': len(frame), 'shown': min(series, max_series)}
+    capped = top_series(frame, max_series)
+    frame = downsample(capped, max_points)
+    summary.update(plotted=len(frame), downsampled=len(frame) < len(capped))
+    return frame, summary
+
+
+def render_mode(points):
+    """plotly express ``render_mode`` for a figure of ``points`` points."""
+    return "webgl" if points > WEBGL_POINTS else "svg"
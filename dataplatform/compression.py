@@ -0,0 +1,92 @@
+"""Content-Encoding negotiation and streaming compression of exports.
+
+gzip is always available through zlib. Brotli and Zstandard are used when
+the optional ``brotli`` and ``zstandard`` packages are installed.
+"""
+
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+# Levels chosen for throughput on large exports rather than maximum ratio
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+# Server preference among encodings the client accepts equally
+PREFERENCE = ["zstd", "br", "gzip"]
+
+# Suffix and MIME type of compressed downloads
+FILE_SUFFIXES = {"gzip": ".gz", "br": ".br", "zstd": ".zst"}
+FILE_MIMES = {"gzip": "application/gzip", "br": "application/x-brotli", "zstd": "application/zstd"}
+
+
+def available():
+    """Encodings this process can produce, in preference order."""
+    return [
+        encoding for encoding in PREFERENCE
+        if encoding == "gzip"
+        or (encoding == "br" and brotli is not None)
+        or (encoding == "zstd" and zstandard is not None)
+    ]
+
+
+def negotiate(accept_encoding):
+    """Best supported encoding for an ``Accept-Encoding`` header, or None for identity."""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, *params = part.split(";")
+        weight = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    weight = float(value.strip())
+                except ValueError:
+                    weight = 0.0
+        weights[name.strip().lower()] = weight
+    wildcard = weights.get("*", 0.0)
+    best, best_weight = None, 0.0
+    for encoding in available():
+        weight = weights.get(encoding, wildcard)
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def _compressor(encoding):
+    """``(compress, flush)`` callables of a fresh streaming compressor."""
+    if encoding == "gzip":
+        obj = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip container
+        return obj.compress, obj.flush
+    if encoding == "br" and brotli is not None:
+        obj = brotli.Compressor(quality=BROTLI_QUALITY)
+        return obj.process, obj.finish
+    if encoding == "zstd" and zstandard is not None:
+        obj = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        return obj.compress, obj.flush
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def iter_compressed(chunks, encoding):
+    """Compress a stream of byte chunks as they are produced."""
+    compress, flush = _compressor(encoding)
+    for chunk in chunks:
+        out = compress(chunk)
+        if out:
+            yield out
+    yield flush()
+
+
+def compress(data, encoding):
+    return b"".join(iter_compressed([data], encoding))
@@ -0,0 +1,190 @@
+"""Pre-aggregated AMOUNT statistics for the charts and ``/api/aggregate``.
+
+The cube holds one cell per ITEM x CURRENCY x RESIDUAL_MATURITY x OBS_DATE
+combination present in the data, with the sum, row count, minimum and
+maximum of AMOUNT. Chart and aggregate queries filter and roll up these
+cells instead of grouping raw rows, and LABEL text is only built for the
+groups that are returned.
+"""
+
+import numpy as np
+import pandas as pd
+
+from dataplatform import metrics
+
+CUBE_DIMENSIONS = ['ITEM', 'CURRENCY', 'RESIDUAL_MATURITY', 'OBS_DATE']
+LABEL_DIMENSIONS = ['ITEM', 'CURRENCY', 'RESIDUAL_MATURITY']
+AGGREGATIONS = ['sum', 'mean', 'count', 'min', 'max']
+
+
+def _combine(codes, cardinalities):
+    """Mixed-radix key of several code arrays (first dimension most significant)."""
+    key = np.zeros(len(codes[0]) if codes else 0, dtype=np.int64)
+    for values, cardinality in zip(codes, cardinalities):
+        key = key * cardinality + values
+    return key
+
+
+def _reduce(ufunc, values, inverse, groups):
+    """``ufunc.reduce`` of ``values`` within each of ``groups`` groups given by ``inverse``."""
+    if not len(values):
+        return np.empty(0, dtype=values.dtype)
+    order = np.argsort(inverse, kind='stable')
+    starts = np.concatenate([[0], np.cumsum(np.bincount(inverse, minlength=groups))[:-1]])
+    return ufunc.reduceat(values[order], starts)
+
+
+class Cube:
+    """Cell codes per dimension and the AMOUNT sum, count, min and max of every cell."""
+
+    def __init__(self, codes, cardinalities, amount, count, minimum, maximum):
+        self.codes = codes
+        self.cardinalities = cardinalities
+        self.amount = amount
+        self.count = count
+        self.minimum = minimum
+        self.maximum = maximum
+
+    @classmethod
+    def build(cls, dataset, start=0):
+        """Aggregate the rows of ``dataset`` from ``start`` onwards."""
+        codes = {dim: dataset.index.keys[dim][start:] for dim in CUBE_DIMENSIONS}
+        cardinalities = {dim: len(dataset.index.offsets[dim]) - 1 for dim in CUBE_DIMENSIONS}
+        key = _combine([codes[d] for d in CUBE_DIMENSIONS], [cardinalities[d] for d in CUBE_DIMENSIONS])
+        cells, inverse = np.unique(key, return_inverse=True)
+        values = np.asarray(dataset.columns['AMOUNT'][start:])
+        amount = np.bincount(inverse, weights=values, minlength=len(cells))
+        count = np.bincount(inverse, minlength=len(cells))
+        minimum = _reduce(np.minimum, values, inverse, len(cells))
+        maximum = _reduce(np.maximum, values, inverse, len(cells))
+
+        cell_codes = {}
+        for dim in reversed(CUBE_DIMENSIONS):
+            cell_codes[dim] = (cells % cardinalities[dim]).astype(np.int32)
+            cells = cells // cardinalities[dim]
+        return cls(cell_codes, cardinalities, amount, count, minimum, maximum)
+
+    def extend(self, dataset, start):
+        """Cube of ``dataset`` whose rows before ``start`` are aggregated here.
+
+        Appended rows carry new observation dates only, so their cells are
+        disjoint from the existing ones and are simply added.
+        """
+        added = Cube.build(dataset, start)
+        codes = {dim: np.concatenate([self.codes[dim], added.codes[dim]]) for dim in CUBE_DIMENSIONS}
+        return Cube(
+            codes,
+            added.cardinalities,
+            np.concatenate([self.amount, added.amount]),
+            np.concatenate([self.count, added.count]),
+            np.concatenate([self.minimum, added.minimum]),
+            np.concatenate([self.maximum, added.maximum]),
+        )
+
+    def arrays(self):
+        """Arrays to store with the snapshot."""
+        arrays = {f'cube.{dim}.codes': self.codes[dim] for dim in CUBE_DIMENSIONS}
+        arrays['cube.cardinalities'] = np.array([self.cardinalities[d] for d in CUBE_DIMENSIONS], dtype=np.int64)
+        for name in ('amount', 'count', 'minimum', 'maximum'):
+            arrays[f'cube.{name}'] = getattr(self, name)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Inverse of :meth:`arrays`; the arrays are used as given (e.g. memory-mapped)."""
+        return cls(
+            {dim: arrays[f'cube.{dim}.codes'] for dim in CUBE_DIMENSIONS},
+            dict(zip(CUBE_DIMENSIONS, arrays['cube.cardinalities'].tolist())),
+            arrays['cube.amount'],
+            arrays['cube.count'],
+            arrays['cube.minimum'],
+            arrays['cube.maximum'],
+        )
+
+    def __len__(self):
+        return len(self.amount)
+
+    def cells(self, encoded):
+        """Positions of the cells matching every ``{dim: codes}`` constraint."""
+        mask = np.ones(len(self), dtype=bool)
+        for dim, allowed in encoded.items():
+            table = np.zeros(self.cardinalities[dim], dtype=bool)
+            table[allowed] = True
+            mask &= table[self.codes[dim]]
+        return np.flatnonzero(mask)
+
+    def rollup(self, encoded, by, agg='sum'):
+        """Aggregate AMOUNT over the matching cells grouped by the ``by`` dimensions.
+
+        ``agg`` is one of AGGREGATIONS. Returns ``({dim: group codes}, values)``
+        with groups in code order; without ``by`` there is a single group if
+        any cell matches.
+        """
+        cells = self.cells(encoded)
+        if by:
+            key = _combine([self.codes[d][cells] for d in by], [self.cardinalities[d] for d in by])
+        else:
+            key = np.zeros(len(cells), dtype=np.int64)
+        groups, inverse = np.unique(key, return_inverse=True)
+        if agg == 'min':
+            values = _reduce(np.minimum, self.minimum[cells], inverse, len(groups))
+        elif agg == 'max':
+            values = _reduce(np.maximum, self.maximum[cells], inverse, len(groups))
+        else:
+            counts = np.bincount(inverse, weights=self.count[cells], minlength=len(groups)).astype(np.int64)
+            values = counts
+            if agg != 'count':
+                values = np.bincount(inverse, weights=self.amount[cells], minlength=len(groups))
+                if agg == 'mean':
+                    values = values / counts
+
+        group_codes = {}
+        for dim in reversed(by):
+            group_codes[dim] = groups % self.cardinalities[dim]
+            groups = groups // self.cardinalities[dim]
+        return {dim: group_codes[dim] for dim in by}, values
+
+
+@metrics.span("chart.totals")
+def label_totals(dataset, query, by_date=False):
+    """AMOUNT per ``ITEM | CURRENCY | RESIDUAL_MATURITY`` label (and per OBS_DATE).
+
+    Same result as grouping the filtered rows by LABEL (or OBS_DATE and LABEL)
+    and summing AMOUNT, sorted the same way.
+    """
+    by = (['OBS_DATE'] if by_date else []) + LABEL_DIMENSIONS
+    group_codes, sums = dataset.cube.rollup(dataset.encode_query(query), by)
+    labels = dataset.vocab['ITEM'][group_codes['ITEM']]
+    for dim in LABEL_DIMENSIONS[1:]:
+        labels = labels + " | " + dataset.vocab[dim][group_codes[dim]]
+
+    result = pd.DataFrame({'LABEL': labels.astype(str), 'AMOUNT': sums})
+    sort_by = ['LABEL']
+    if by_date:
+        days = dataset.dates[group_codes['OBS_DATE']]
+        dates = days.astype('datetime64[D]').astype('datetime64[ns]')
+        result.insert(0, 'OBS_DATE', dates)
+        sort_by = ['OBS_DATE', 'LABEL']
+    return result.sort_values(sort_by, kind='stable').reset_index(drop=True)
+
+
+@metrics.span("aggregate")
+def aggregate(dataset, query, by, agg='sum'):
+    """AMOUNT aggregated with ``agg`` over the rows matching ``query``, per ``by`` group.
+
+    Same result as ``frame.groupby(by)['AMOUNT'].agg(agg)`` on the filtered
+    rows, with one column per ``by`` dimension and the result in AMOUNT.
+    """
+    group_codes, values = dataset.cube.rollup(dataset.encode_query(query), list(by), agg)
+    result = {}
+    for dim in by:
+        if dim == 'OBS_DATE':
+            days = dataset.dates[group_codes[dim]]
+            result[dim] = days.astype('datetime64[D]').astype('datetime64[ns]')
+        else:
+            result[dim] = dataset.vocab[dim][group_codes[dim]].astype(str)
+    result['AMOUNT'] = values
+    frame = pd.DataFrame(result)
+    if by:
+        frame = frame.sort_values(list(by), kind='stable')
+    return frame.reset_index(drop=True)
@@ -0,0 +1,246 @@
+"""Dictionary-encoded in-memory model of the reserves dataset.
+
+ITEM, CURRENCY and RESIDUAL_MATURITY are held as int32 codes into a shared
+vocabulary, OBS_DATE as int32 day numbers since 1970-01-01 and AMOUNT as
+float64. Filters are answered by a FilterIndex over the codes and a pandas
+frame is only materialised for the rows that are actually shown.
+"""
+
+import datetime
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from dataplatform import metrics
+from dataplatform.cube import Cube
+from dataplatform.index import FilterIndex
+from dataplatform import snapshot
+from dataplatform.snapshot import (
+    COLUMNS, DATA_FILE, DATA_SHEET, DIMENSIONS, SNAPSHOT_DIR, read_derived, read_manifest, write_derived,
+)
+
+EPOCH = datetime.date(1970, 1, 1)
+
+# Seconds between checks of the workbook for a new version
+CHECK_INTERVAL = 2.0
+
+logger = logging.getLogger(__name__)
+
+
+def to_day_numbers(dates):
+    """Convert dates (date, datetime, Timestamp or ISO string) to int32 day numbers."""
+    return np.array(
+        [(pd.Timestamp(d).date() - EPOCH).days for d in dates],
+        dtype=np.int32,
+    )
+
+
+def from_day_numbers(days):
+    return np.asarray(days, dtype=np.int32).astype('datetime64[D]')
+
+
+class Dataset:
+    """Typed column arrays plus the dimension vocabularies of one snapshot version."""
+
+    def __init__(self, version, columns, vocab, modified=None):
+        self.version = version
+        self.columns = columns
+        self.modified = modified  # workbook mtime (UTC) when the version was ingested; fixed per version
+        self.vocab = {dim: np.asarray(values, dtype=object) for dim, values in vocab.items()}
+        self._codes = {dim: {v: i for i, v in enumerate(values)} for dim, values in vocab.items()}
+        self._dates = None
+        self._index = None
+        self._cube = None
+
+    @classmethod
+    @metrics.span("dataset.load")
+    def load(cls, version, snapshot_dir=SNAPSHOT_DIR, base=None):
+        """Memory-map the columns, index and aggregates of a snapshot version.
+
+        The index and aggregates are built (or, if ``base`` is the loaded parent
+        of an appended version, extended from ``base``) only by the first
+        process to load the version. They are then stored with the snapshot
+        and every process, this one included, maps the stored copy read-only.
+        ``base`` itself is left unchanged.
+        """
+        manifest = read_manifest(version, snapshot_dir)
+        if manifest is None:
+            raise FileNotFoundError(f"No snapshot found for version {version!r}")
+        directory = os.path.join(snapshot_dir, version)
+        columns = {
+            col: np.load(os.path.join(directory, f"{col}.npy"), mmap_mode='r')
+            for col in COLUMNS
+        }
+        modified = datetime.datetime.fromtimestamp(
+            manifest["source"]["mtime_ns"] / 1e9, datetime.timezone.utc
+        ).replace(microsecond=0)
+        dataset = cls(version, columns, manifest["vocab"], modified)
+
+        derived = read_derived(version, snapshot_dir)
+        if derived is None:
+            if base is not None and manifest.get("parent") == base.version:
+                start = len(base)
+                new_dates = np.unique(columns['OBS_DATE'][start:])
+                dataset._dates = np.concatenate([base.dates, new_dates])
+                dataset._index = base.index.extend(dataset, start)
+                dataset._cube = base.cube.extend(dataset, start)
+            # Build the filter index and chart aggregates once, at load time
+            dataset.index
+            dataset.cube
+            try:
+                write_derived(version, dataset.derived_arrays(), snapshot_dir)
+            except OSError:
+                return dataset  # read-only snapshot directory: keep the private copies
+            derived = read_derived(version, snapshot_dir)
+        dataset._dates = derived['dates']
+        dataset._index = FilterIndex.from_arrays(derived, dataset)
+        dataset._cube = Cube.from_arrays(derived)
+        return dataset
+
+    def derived_arrays(self):
+        """Dates, index and cube arrays, as stored with the snapshot."""
+        return {'dates': self.dates, **self.index.arrays(), **self.cube.arrays()}
+
+    def __len__(self):
+        return len(self.columns['AMOUNT'])
+
+    @property
+    def dates(self):
+        """Sorted unique OBS_DATE day numbers."""
+        if self._dates is None:
+            self._dates = np.unique(self.columns['OBS_DATE'])
+        return self._dates
+
+    def date_options(self):
+        return [d.item() for d in from_day_numbers(self.dates)]
+
+    def options(self, dim):
+        return sorted(self.vocab[dim])
+
+    def encode(self, dim, values):
+        """Return the codes of ``values`` in ``dim``; unknown values are dropped.
+
+        OBS_DATE codes are positions in :attr:`dates`.
+        """
+        if dim == 'OBS_DATE':
+            days = to_day_numbers(values)
+            if not len(self.dates):
+                return np.empty(0, dtype=np.int32)
+            pos = np.searchsorted(self.dates, days)
+            known = (pos < len(self.dates)) & (self.dates[np.minimum(pos, len(self.dates) - 1)] == days)
+            return pos[known].astype(np.int32)
+        lookup = self._codes[dim]
+        return np.array([lookup[v] for v in values if v in lookup], dtype=np.int32)
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = FilterIndex.build(self)
+        return self._index
+
+    @property
+    def cube(self):
+        if self._cube is None:
+            self._cube = Cube.build(self)
+        return self._cube
+
+    def date_range(self, start=None, end=None):
+        """OBS_DATE codes from ``start`` to ``end`` inclusive, by binary search over :attr:`dates`."""
+        lo = 0 if start is None else np.searchsorted(self.dates, to_day_numbers([start])[0], 'left')
+        hi = len(self.dates) if end is None else np.searchsorted(self.dates, to_day_numbers([end])[0], 'right')
+        return np.arange(lo, max(lo, hi), dtype=np.int32)
+
+    def encode_query(self, query):
+        """``{dimension: codes}`` for every constrained dimension of ``query``."""
+        encoded = {dim: self.encode(dim, values) for dim, values in query.filters().items()}
+        if query.start is not None or query.end is not None:
+            codes = self.date_range(query.start, query.end)
+            if 'OBS_DATE' in encoded:
+                codes = np.intersect1d(encoded['OBS_DATE'], codes)
+            encoded['OBS_DATE'] = codes
+        return encoded
+
+    @metrics.span("filter")
+    def rows(self, query):
+        """Positions of the rows matching ``query``, in dataset order."""
+        return self.index.lookup(self.encode_query(query))
+
+    def sort_keys(self, column):
+        """Per-row keys that order ``column`` as its displayed values would sort."""
+        values = np.asarray(self.columns[column])
+        if column in DIMENSIONS:
+            ranks = np.empty(len(self.vocab[column]), dtype=np.int32)
+            ranks[np.argsort(self.vocab[column].astype(str), kind='stable')] = np.arange(len(ranks))
+            return ranks[values]
+        return values
+
+    def sort(self, rows, column, descending=False):
+        """``rows`` ordered by ``column``; ties keep dataset order."""
+        keys = self.sort_keys(column)[rows]
+        if descending:
+            keys = -keys.astype(np.float64)
+        return rows[np.argsort(keys, kind='stable')]
+
+    @metrics.span("frame")
+    def frame(self, rows=None):
+        """Materialise the selected rows as a DataFrame in the published column order."""
+        data = {}
+        for col in COLUMNS:
+            values = np.asarray(self.columns[col])
+            if rows is not None:
+                values = values[rows]
+            if col in DIMENSIONS:
+                values = pd.Categorical.from_codes(values, categories=self.vocab[col])
+            elif col == 'OBS_DATE':
+                values = from_day_numbers(values).astype('datetime64[ns]')
+            data[col] = values
+        return pd.DataFrame(data, columns=COLUMNS)
+
+
+_current = None
+_checked = 0.0
+_lock = threading.Lock()
+
+
+def current(path=DATA_FILE, sheet=DATA_SHEET, snapshot_dir=SNAPSHOT_DIR):
+    """The Dataset of the current workbook version, shared by the whole process.
+
+    The workbook is checked at most every CHECK_INTERVAL seconds. A new
+    version is loaded, or extended from the previous one when it only
+    appends dates, and then swapped in as a whole. Callers that still hold
+    the previous Dataset keep a consistent view of the old version.
+
+    If the workbook cannot be read (e.g. while it is being copied) once a
+    version is loaded, the error is logged and the loaded version is kept
+    until the next check.
+    """
+    global _current, _checked
+    dataset = _current
+    if dataset is not None:
+        if time.monotonic() - _checked < CHECK_INTERVAL:
+            return dataset
+        # Keep serving the loaded version while another thread refreshes
+        if not _lock.acquire(blocking=False):
+            return dataset
+    else:
+        _lock.acquire()
+    try:
+        if _current is None or time.monotonic() - _checked >= CHECK_INTERVAL:
+            try:
+                manifest = snapshot.refresh(path, sheet, snapshot_dir)
+                if _current is None or _current.version != manifest["version"]:
+                    _current = Dataset.load(manifest["version"], snapshot_dir, base=_current)
+                    metrics.increment("dataset.versions_loaded")
+            except Exception:
+                if _current is None:
+                    raise
+                logger.exception("Could not refresh %s; still serving version %s", path, _current.version)
+                metrics.increment("dataset.refresh_failed")
+            _checked = time.monotonic()
+        return _current
+    finally:
+        _lock.release()
@@ -0,0 +1,150 @@
+"""Serialisation of filtered results for downloads and API responses.
+
+The ``iter_*`` functions (and ``iter_xlsx``, ``iter_arrow`` and ``iter_parquet``
+for the binary formats) stream the selected
+rows of a Dataset in fixed-size batches, so memory stays flat and the first
+bytes can be sent before the whole result is serialised.
+
+JSON is encoded straight from the column arrays: dimension values are
+JSON-encoded once per vocabulary entry and dates once per observation date,
+then concatenated per row without building a dict per record.
+"""
+
+import datetime
+import json
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from dataplatform.arrow import ARROW_MIME, PARQUET_MIME, iter_arrow, iter_parquet
+from dataplatform.snapshot import COLUMNS, DIMENSIONS
+from dataplatform.xlsx import iter_xlsx
+
+EXCEL_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+NDJSON_MIME = "application/x-ndjson"
+
+BATCH_ROWS = 10_000
+
+
+def _json_default(value):
+    if isinstance(value, (pd.Timestamp, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _dumps(value):
+    return json.dumps(value, default=_json_default, ensure_ascii=False, separators=(",", ":"))
+
+
+def iter_batches(dataset, rows, batch_rows=BATCH_ROWS):
+    """Yield the selected rows as DataFrames of at most ``batch_rows`` rows."""
+    for start in range(0, len(rows), batch_rows):
+        yield dataset.frame(rows[start:start + batch_rows])
+
+
+def iter_csv(dataset, rows, batch_rows=BATCH_ROWS):
+    header = True
+    for batch in iter_batches(dataset, rows, batch_rows):
+        yield batch.to_csv(index=False, header=header).encode('utf-8')
+        header = False
+    if header:
+        yield dataset.frame(rows[:0]).to_csv(index=False).encode('utf-8')
+
+
+@lru_cache(maxsize=4)
+def _json_vocabulary(dataset):
+    """JSON text of every dimension value and observation date of ``dataset``."""
+    encoded = {
+        dim: np.array([_dumps(v) for v in dataset.vocab[dim]], dtype=object)
+        for dim in DIMENSIONS
+    }
+    encoded['OBS_DATE'] = np.array(
+        [_dumps(pd.Timestamp(d).isoformat()) for d in dataset.dates.astype('datetime64[D]')],
+        dtype=object,
+    )
+    return encoded
+
+
+def _json_column(dataset, col, rows):
+    """JSON text of the values of ``col`` in the selected rows."""
+    values = np.asarray(dataset.columns[col])[rows]
+    if col in DIMENSIONS:
+        return _json_vocabulary(dataset)[col][values]
+    if col == 'OBS_DATE':
+        return _json_vocabulary(dataset)[col][np.searchsorted(dataset.dates, values)]
+    # float repr is what json.dumps emits for finite floats
+    to_text = float.__repr__ if np.isfinite(values).all() else _dumps
+    return np.array(list(map(to_text, values.tolist())), dtype=object)
+
+
+def _json_records(dataset, rows):
+    """One JSON object per selected row, identical to ``json.dumps`` of the record."""
+    records = '{'
+    for i, col in enumerate(COLUMNS):
+        records = records + (',' if i else '') + _dumps(col) + ':' + _json_column(dataset, col, rows)
+    return (records + '}').tolist()
+
+
+def iter_ndjson(dataset, rows, batch_rows=BATCH_ROWS):
+    """One JSON object per line, one line per row."""
+    for start in range(0, len(rows), batch_rows):
+        lines = _json_records(dataset, rows[start:start + batch_rows])
+        yield ("\n".join(lines) + "\n").encode('utf-8')
+
+
+def iter_json(dataset, rows, batch_rows=BATCH_ROWS, orient="records", total=None):
+    """Stream ``{"data": ..., "count": n, "timestamp": ...}`` as compact UTF-8 JSON.
+
+    With ``orient="records"`` data is a list of row objects. With
+    ``orient="columns"`` it is ``{"CURRENCY": [...], "ITEM": [...], ...}``.
+    ``total`` adds the size of the whole result when ``rows`` is one page of it.
+    """
+    if orient == "columns":
+        yield b'{"data":{'
+        for i, col in enumerate(COLUMNS):
+            yield f'{"," if i else ""}{_dumps(col)}:['.encode('utf-8')
+            separator = ''
+            for start in range(0, len(rows), batch_rows):
+                values = _json_column(dataset, col, rows[start:start + batch_rows])
+                yield (separator + ",".join(values.tolist())).encode('utf-8')
+                separator = ','
+            yield b']'
+        yield b'}'
+    else:
+        yield b'{"data":['
+        separator = ''
+        for start in range(0, len(rows), batch_rows):
+            records = _json_records(dataset, rows[start:start + batch_rows])
+            yield (separator + ",".join(records)).encode('utf-8')
+            separator = ','
+        yield b']'
+    if total is not None:
+        yield f',"count":{len(rows)},"total":{total}'.encode('utf-8')
+    else:
+        yield f',"count":{len(rows)}'.encode('utf-8')
+    yield f',"timestamp":{_dumps(pd.Timestamp.now().isoformat())}}}'.encode('utf-8')
+
+
+def frame_to_bytes(frame, fmt, **meta):
+    """A small result frame (e.g. an aggregate) as CSV, or as JSON records plus ``meta``."""
+    if fmt == "csv":
+        return frame.to_csv(index=False).encode('utf-8')
+    records = frame.to_dict('records')
+    payload = {"data": records, "count": len(records), **meta, "timestamp": pd.Timestamp.now().isoformat()}
+    return _dumps(payload).encode('utf-8')
+
+
+def to_bytes(dataset, rows, fmt, orient="records", total=None):
+    """The whole response body for ``fmt`` (json, csv, ndjson, excel, arrow or parquet)."""
+    if fmt == "csv":
+        return b"".join(iter_csv(dataset, rows))
+    if fmt == "ndjson":
+        return b"".join(iter_ndjson(dataset, rows))
+    if fmt == "excel":
+        return b"".join(iter_xlsx(dataset, rows))
+    if fmt == "arrow":
+        return b"".join(iter_arrow(dataset, rows))
+    if fmt == "parquet":
+        return b"".join(iter_parquet(dataset, rows))
+    return b"".join(iter_json(dataset, rows, orient=orient, total=total))
@@ -0,0 +1,125 @@
+"""Inverted index over the filter dimensions of a Dataset."""
+
+import numpy as np
+
+from dataplatform.query import FILTER_FIELDS
+
+FILTER_DIMENSIONS = list(FILTER_FIELDS.values())
+
+
+class FilterIndex:
+    """Sorted row positions (postings) for every value of every filter dimension.
+
+    Postings are stored CSR-style: ``order[dim]`` holds all row positions
+    grouped by code and ``order[dim][offsets[dim][c]:offsets[dim][c + 1]]``
+    are the rows with code ``c``. A lookup materialises the postings of the
+    most selective dimension and narrows them with the other dimensions'
+    codes, so its cost follows the result size rather than the dataset size.
+
+    A dimension the rows are stored sorted by (OBS_DATE) is ``clustered``: the
+    rows of each code form a contiguous range, so a run of consecutive codes,
+    such as a date range, is answered as one slice without sorting.
+    """
+
+    def __init__(self, keys, order, offsets):
+        self.keys = keys
+        self.order = order
+        self.offsets = offsets
+        self.clustered = {dim for dim, codes in keys.items() if (np.diff(codes) >= 0).all()}
+
+    @classmethod
+    def build(cls, dataset):
+        keys, order, offsets = {}, {}, {}
+        for dim in FILTER_DIMENSIONS:
+            if dim == 'OBS_DATE':
+                codes = np.searchsorted(dataset.dates, dataset.columns['OBS_DATE']).astype(np.int32)
+                cardinality = len(dataset.dates)
+            else:
+                codes = np.asarray(dataset.columns[dim])
+                cardinality = len(dataset.vocab[dim])
+            keys[dim] = codes
+            order[dim] = np.argsort(codes, kind='stable').astype(np.int64)
+            offsets[dim] = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=cardinality))))
+        return cls(keys, order, offsets)
+
+    def extend(self, dataset, start):
+        """Index of ``dataset`` whose rows before ``start`` are the rows of this index.
+
+        Appended rows have positions beyond every existing posting, so they are
+        inserted at the end of their code's slice and the postings stay sorted.
+        Cost is linear in the index size (one memmove per array) plus sorting
+        the appended rows only.
+        """
+        keys, order, offsets = {}, {}, {}
+        for dim in FILTER_DIMENSIONS:
+            if dim == 'OBS_DATE':
+                new_keys = np.searchsorted(dataset.dates, dataset.columns['OBS_DATE'][start:]).astype(np.int32)
+                keys[dim] = np.concatenate([self.keys[dim], new_keys])
+                cardinality = len(dataset.dates)
+            else:
+                keys[dim] = np.asarray(dataset.columns[dim])
+                new_keys = keys[dim][start:]
+                cardinality = len(dataset.vocab[dim])
+            old_offsets = self.offsets[dim]
+            old_offsets = np.concatenate([old_offsets, np.full(cardinality + 1 - len(old_offsets), old_offsets[-1])])
+
+            new_order = np.argsort(new_keys, kind='stable')
+            order[dim] = np.insert(self.order[dim], old_offsets[new_keys[new_order] + 1], new_order + start)
+            offsets[dim] = old_offsets + np.concatenate(([0], np.cumsum(np.bincount(new_keys, minlength=cardinality))))
+        return FilterIndex(keys, order, offsets)
+
+    def arrays(self):
+        """Arrays to store with the snapshot; dimension keys other than OBS_DATE are its columns."""
+        arrays = {'index.OBS_DATE.keys': self.keys['OBS_DATE']}
+        for dim in FILTER_DIMENSIONS:
+            arrays[f'index.{dim}.order'] = self.order[dim]
+            arrays[f'index.{dim}.offsets'] = self.offsets[dim]
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, dataset):
+        """Inverse of :meth:`arrays`; the arrays are used as given (e.g. memory-mapped)."""
+        keys = {
+            dim: arrays['index.OBS_DATE.keys'] if dim == 'OBS_DATE' else np.asarray(dataset.columns[dim])
+            for dim in FILTER_DIMENSIONS
+        }
+        order = {dim: arrays[f'index.{dim}.order'] for dim in FILTER_DIMENSIONS}
+        offsets = {dim: arrays[f'index.{dim}.offsets'] for dim in FILTER_DIMENSIONS}
+        return cls(keys, order, offsets)
+
+    def __len__(self):
+        return len(self.order[FILTER_DIMENSIONS[0]])
+
+    def count(self, dim, codes):
+        offsets = self.offsets[dim]
+        return int(np.sum(offsets[codes + 1] - offsets[codes]))
+
+    def postings(self, dim, codes):
+        """Sorted row positions having any of ``codes`` in ``dim``."""
+        order, offsets = self.order[dim], self.offsets[dim]
+        if dim in self.clustered:
+            codes = np.sort(codes)
+            if len(codes) and codes[-1] - codes[0] + 1 == len(codes):
+                return order[offsets[codes[0]]:offsets[codes[-1] + 1]]
+        slices = [order[offsets[c]:offsets[c + 1]] for c in codes]
+        if len(slices) == 1:
+            return slices[0]
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        rows = np.concatenate(slices)
+        return rows if dim in self.clustered else np.sort(rows)
+
+    def lookup(self, encoded):
+        """Rows matching every ``{dim: codes}`` constraint in ``encoded``."""
+        if not encoded:
+            return np.arange(len(self), dtype=np.int64)
+        ranked = sorted(encoded.items(), key=lambda item: self.count(*item))
+        dim, codes = ranked[0]
+        rows = self.postings(dim, codes)
+        for dim, codes in ranked[1:]:
+            if not len(rows):
+                break
+            table = np.zeros(len(self.offsets[dim]) - 1, dtype=bool)
+            table[codes] = True
+            rows = rows[table[self.keys[dim][rows]]]
+        return rows
@@ -0,0 +1,182 @@
+"""Persistent API key store shared by the Streamlit app and the API server.
+
+Keys are stored in SQLite as SHA-256 hashes only, next to a masked form for
+display. Validation is answered from an in-process cache of the hashes. Usage
+counters are buffered in memory and written in batches by a background
+thread, so accounting adds no database write to a request. Each key carries
+its own rate limits; keys without stored limits use the defaults.
+"""
+
+import atexit
+import datetime
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from dataplatform.ratelimit import Limits
+
+KEY_DB = os.environ.get("DATA_PLATFORM_KEY_DB", "api_keys.sqlite3")
+
+# Seconds between usage flushes, and between reloads of the key table when
+# an unknown key is presented (keys may be created by another process)
+FLUSH_INTERVAL = 5.0
+RELOAD_INTERVAL = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS api_keys (
+    key_hash   TEXT PRIMARY KEY,
+    prefix     TEXT NOT NULL,
+    suffix     TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    last_used  TEXT,
+    call_count INTEGER NOT NULL DEFAULT 0,
+    rate        REAL,
+    burst       REAL,
+    daily_quota REAL
+)
+"""
+
+# Columns added after the first release of the table
+_LIMIT_COLUMNS = {"rate": "REAL", "burst": "REAL", "daily_quota": "REAL"}
+
+
+def hash_key(key):
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _parse_time(value):
+    return datetime.datetime.fromisoformat(value) if value else None
+
+
+def _limits(rate, burst, daily_quota):
+    defaults = Limits()
+    return Limits(
+        rate=defaults.rate if rate is None else rate,
+        burst=defaults.burst if burst is None else burst,
+        daily_quota=defaults.daily_quota if daily_quota is None else daily_quota,
+    )
+
+
+class KeyStore:
+    """API keys in SQLite with a cached hash lookup and batched usage counters."""
+
+    def __init__(self, path=KEY_DB, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._known = {}
+        self._loaded_at = 0.0
+        self._pending = {}
+        self._flusher = None
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(api_keys)")}
+            for column, kind in _LIMIT_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE api_keys ADD COLUMN {column} {kind}")
+        self._reload()
+        atexit.register(self.flush)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _reload(self):
+        with self._connect() as conn:
+            known = {
+                key_hash: _limits(rate, burst, daily_quota)
+                for key_hash, rate, burst, daily_quota in conn.execute(
+                    "SELECT key_hash, rate, burst, daily_quota FROM api_keys"
+                )
+            }
+        with self._lock:
+            self._known = known
+            self._loaded_at = time.monotonic()
+
+    def create(self, limits=None):
+        """Generate and store a new key; the key itself is only returned here."""
+        limits = limits or Limits()
+        key = str(uuid.uuid4())
+        key_hash = hash_key(key)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO api_keys (key_hash, prefix, suffix, created_at, rate, burst, daily_quota) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key_hash, key[:8], key[-4:], datetime.datetime.now().isoformat(),
+                 limits.rate, limits.burst, limits.daily_quota),
+            )
+        with self._lock:
+            self._known[key_hash] = limits
+        return key
+
+    def validate(self, key):
+        """The Limits of ``key`` if it exists, else None; records a call against it."""
+        if not key:
+            return None
+        key_hash = hash_key(key)
+        limits = self._known.get(key_hash)
+        if limits is None:
+            if time.monotonic() - self._loaded_at < RELOAD_INTERVAL:
+                return None
+            self._reload()
+            limits = self._known.get(key_hash)
+            if limits is None:
+                return None
+        self.record_use(key_hash)
+        return limits
+
+    def record_use(self, key_hash):
+        with self._lock:
+            count, _ = self._pending.get(key_hash, (0, None))
+            self._pending[key_hash] = (count + 1, datetime.datetime.now().isoformat())
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="key-usage-flush", daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Write buffered usage counters in one transaction."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE api_keys SET call_count = call_count + ?, last_used = ? WHERE key_hash = ?",
+                [(count, last_used, key_hash) for key_hash, (count, last_used) in pending.items()],
+            )
+
+    def list_keys(self):
+        """Stored keys with their masked form, limits and usage, including unflushed calls."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT key_hash, prefix, suffix, created_at, last_used, call_count, "
+                "rate, burst, daily_quota FROM api_keys ORDER BY created_at"
+            ).fetchall()
+        with self._lock:
+            pending = dict(self._pending)
+        keys = []
+        for key_hash, prefix, suffix, created_at, last_used, call_count, *limits in rows:
+            count, pending_used = pending.get(key_hash, (0, None))
+            keys.append({
+                "masked_key": f"{prefix}...{suffix}",
+                "created_at": _parse_time(created_at),
+                "last_used": _parse_time(pending_used or last_used),
+                "call_count": call_count + count,
+                "limits": _limits(*limits),
+            })
+        return keys
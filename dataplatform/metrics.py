@@ -0,0 +1,142 @@
+"""In-process timing spans, counters and their Prometheus text export.
+
+Stages are timed with ``with metrics.span("filter"):`` and events counted
+with ``metrics.increment("api.rate_limited")``. Every span keeps an exact
+count and sum plus its most recent durations, from which percentiles are
+computed on demand, so recording costs a lock and a deque append.
+
+Metrics are per process: the Streamlit app shows its own on the Performance
+page and the API server exposes each worker's at ``/metrics``.
+"""
+
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# Recent durations kept per span for percentiles
+RESERVOIR_SIZE = 2048
+QUANTILES = (0.5, 0.9, 0.99)
+
+_NAME = re.compile(r'[^a-zA-Z0-9_]')
+
+
+class _Series:
+    __slots__ = ("count", "total", "maximum", "recent")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.recent = deque(maxlen=RESERVOIR_SIZE)
+
+
+class Registry:
+    """Thread-safe store of span durations and counters."""
+
+    def __init__(self):
+        self._spans = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        with self._lock:
+            series = self._spans.get(name)
+            if series is None:
+                series = self._spans[name] = _Series()
+            series.count += 1
+            series.total += seconds
+            series.maximum = max(series.maximum, seconds)
+            series.recent.append(seconds)
+
+    @contextmanager
+    def span(self, name):
+        """Time the ``with`` block as one observation of ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name, chunks):
+        """Pass ``chunks`` through, timing only the work of producing them.
+
+        Time the consumer spends between chunks (e.g. sending them) is not
+        counted, so a streamed export is measured like a buffered one.
+        """
+        elapsed = 0.0
+        iterator = iter(chunks)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    elapsed += time.perf_counter() - start
+                    break
+                elapsed += time.perf_counter() - start
+                yield chunk
+        finally:
+            self.observe(name, elapsed)
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+
+    def spans(self):
+        """Per span: count, total and max seconds, and percentiles of recent durations."""
+        with self._lock:
+            series = {name: (s.count, s.total, s.maximum, np.array(s.recent)) for name, s in self._spans.items()}
+        stats = []
+        for name, (count, total, maximum, recent) in sorted(series.items()):
+            row = {"span": name, "count": count, "total": total, "mean": total / count, "max": maximum}
+            for q, value in zip(QUANTILES, np.quantile(recent, QUANTILES)):
+                row[f"p{round(q * 100)}"] = float(value)
+            stats.append(row)
+        return stats
+
+    def counters(self):
+        with self._lock:
+            return dict(sorted(self._counters.items()))
+
+    def prometheus(self, prefix="dataplatform", gauges=None):
+        """Prometheus text exposition: one summary over all spans, one counter family.
+
+        ``gauges`` adds ``{name: value}`` sampled by the caller (e.g. cache size).
+        """
+        lines = [
+            f"# HELP {prefix}_span_seconds Duration of instrumented stages.",
+            f"# TYPE {prefix}_span_seconds summary",
+        ]
+        for row in self.spans():
+            label = f'span="{row["span"]}"'
+            for q in QUANTILES:
+                lines.append(f'{prefix}_span_seconds{{{label},quantile="{q}"}} {row[f"p{round(q * 100)}"]!r}')
+            lines.append(f'{prefix}_span_seconds_sum{{{label}}} {row["total"]!r}')
+            lines.append(f'{prefix}_span_seconds_count{{{label}}} {row["count"]}')
+        lines += [
+            f"# HELP {prefix}_events_total Counted events.",
+            f"# TYPE {prefix}_events_total counter",
+        ]
+        for name, value in self.counters().items():
+            lines.append(f'{prefix}_events_total{{event="{name}"}} {value}')
+        for name, value in (gauges or {}).items():
+            metric = f"{prefix}_{_NAME.sub('_', name)}"
+            lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry used by the module-level helpers
+REGISTRY = Registry()
+span = REGISTRY.span
+timed = REGISTRY.timed
+observe = REGISTRY.observe
+increment = REGISTRY.increment
@@ -0,0 +1,224 @@
+"""Normalised filter query shared by the explorer, the simulated endpoint and the API."""
+
+import datetime
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import pandas as pd
+
+from dataplatform.cube import AGGREGATIONS, CUBE_DIMENSIONS
+from dataplatform.snapshot import COLUMNS
+
+# Query attribute -> dataset dimension
+FILTER_FIELDS = {
+    'dates': 'OBS_DATE',
+    'items': 'ITEM',
+    'currencies': 'CURRENCY',
+    'maturities': 'RESIDUAL_MATURITY',
+}
+
+
+def _normalise(values):
+    if values is None:
+        return None
+    return tuple(sorted(set(values)))
+
+
+def _parse_date(value):
+    """``value`` as a date, or None when it is missing, empty or NaT."""
+    if value is None or not str(value).strip():
+        return None
+    timestamp = pd.to_datetime(value)
+    return None if pd.isna(timestamp) else timestamp.date()
+
+
+@dataclass(frozen=True)
+class Query:
+    """Filter values per dimension, sorted and de-duplicated.
+
+    ``None`` leaves a dimension unconstrained; an empty tuple matches nothing.
+    ``start`` and ``end`` bound OBS_DATE inclusively and combine with ``dates``.
+    """
+
+    dates: Optional[Tuple[datetime.date, ...]] = None
+    items: Optional[Tuple[str, ...]] = None
+    currencies: Optional[Tuple[str, ...]] = None
+    maturities: Optional[Tuple[str, ...]] = None
+    start: Optional[datetime.date] = None
+    end: Optional[datetime.date] = None
+
+    def __post_init__(self):
+        for name in FILTER_FIELDS:
+            object.__setattr__(self, name, _normalise(getattr(self, name)))
+
+    @classmethod
+    def from_params(cls, params):
+        """Parse the ``/api/data`` query parameters.
+
+        ``date`` and ``dates`` are intersected when both are given, and
+        ``start``/``end`` restrict them to a range. A date parameter that
+        fails to parse, or is empty, is ignored, as the endpoint always did;
+        empty entries of ``dates`` (e.g. a trailing comma) are skipped.
+        """
+        dates = None
+        if "date" in params:
+            try:
+                date = _parse_date(params["date"])
+            except (ValueError, TypeError):
+                date = None
+            if date is not None:
+                dates = [date]
+        if "dates" in params:
+            try:
+                date_list = [_parse_date(d) for d in params["dates"].split(",")]
+                date_list = [d for d in date_list if d is not None]
+                dates = date_list if dates is None else [d for d in date_list if d in dates]
+            except (ValueError, TypeError):
+                pass
+
+        def split(name):
+            return params[name].split(",") if name in params else None
+
+        def parse_date(name):
+            try:
+                return _parse_date(params.get(name))
+            except (ValueError, TypeError):
+                return None
+
+        return cls(
+            dates=dates,
+            items=split("items"),
+            currencies=split("currencies"),
+            maturities=split("maturities"),
+            start=parse_date("start"),
+            end=parse_date("end"),
+        )
+
+    def to_params(self):
+        """Inverse of :meth:`from_params`, for building example URLs."""
+        params = {}
+        if self.dates is not None:
+            formatted = [d.strftime("%Y-%m-%d") for d in self.dates]
+            if len(formatted) == 1:
+                params['date'] = formatted[0]
+            else:
+                params['dates'] = ",".join(formatted)
+        for name in ('items', 'currencies', 'maturities'):
+            values = getattr(self, name)
+            if values is not None:
+                params[name] = ",".join(values)
+        for name in ('start', 'end'):
+            value = getattr(self, name)
+            if value is not None:
+                params[name] = value.strftime("%Y-%m-%d")
+        return params
+
+    @property
+    def has_dates(self):
+        """Whether OBS_DATE is constrained by a list or a range."""
+        return self.dates is not None or self.start is not None or self.end is not None
+
+    def filters(self):
+        """Constrained dimensions as ``{dimension: values}``."""
+        return {
+            dim: getattr(self, name)
+            for name, dim in FILTER_FIELDS.items()
+            if getattr(self, name) is not None
+        }
+
+
+@dataclass(frozen=True)
+class Page:
+    """A window of a result: ``limit`` rows from ``offset`` after sorting by ``sort``.
+
+    ``limit=None`` returns everything from ``offset``; ``sort=None`` keeps
+    dataset order.
+    """
+
+    offset: int = 0
+    limit: Optional[int] = None
+    sort: Optional[str] = None
+    descending: bool = False
+
+    def __post_init__(self):
+        if self.offset < 0 or (self.limit is not None and self.limit < 0):
+            raise ValueError("offset and limit must not be negative")
+        if self.sort is not None and self.sort not in COLUMNS:
+            raise ValueError(f"sort must be one of {', '.join(COLUMNS)}")
+
+    @classmethod
+    def from_params(cls, params):
+        """Parse ``offset``, ``limit`` and ``sort`` (``-COLUMN`` sorts descending).
+
+        Raises ValueError for values that are not valid.
+        """
+        sort = params.get("sort") or None
+        descending = sort is not None and sort.startswith("-")
+        limit = params.get("limit")
+        return cls(
+            offset=int(params.get("offset") or 0),
+            limit=None if limit is None or limit == "" else int(limit),
+            sort=sort.lstrip("-") if sort else None,
+            descending=descending,
+        )
+
+    @property
+    def is_full(self):
+        return self.offset == 0 and self.limit is None and self.sort is None
+
+    def apply(self, rows):
+        stop = None if self.limit is None else self.offset + self.limit
+        return rows[self.offset:stop]
+
+    def count(self, total):
+        """Rows :meth:`apply` returns from a result of ``total`` rows."""
+        remaining = max(0, total - self.offset)
+        return remaining if self.limit is None else min(self.limit, remaining)
+
+    def to_params(self):
+        params = {}
+        if self.offset:
+            params['offset'] = str(self.offset)
+        if self.limit is not None:
+            params['limit'] = str(self.limit)
+        if self.sort is not None:
+            params['sort'] = ("-" if self.descending else "") + self.sort
+        return params
+
+
+@dataclass(frozen=True)
+class Aggregation:
+    """Group-by dimensions and aggregate function of ``/api/aggregate``.
+
+    ``group_by=()`` aggregates all matching rows into a single total.
+    """
+
+    group_by: Tuple[str, ...] = ()
+    agg: str = "sum"
+
+    def __post_init__(self):
+        # Keep the requested order (it orders the output), drop repeats
+        object.__setattr__(self, "group_by", tuple(dict.fromkeys(self.group_by)))
+        for dim in self.group_by:
+            if dim not in CUBE_DIMENSIONS:
+                raise ValueError(f"group_by must be a subset of {', '.join(CUBE_DIMENSIONS)}")
+        if self.agg not in AGGREGATIONS:
+            raise ValueError(f"agg must be one of {', '.join(AGGREGATIONS)}")
+
+    @classmethod
+    def from_params(cls, params):
+        """Parse ``group_by`` (comma-separated) and ``agg``.
+
+        Raises ValueError for values that are not valid.
+        """
+        group_by = params.get("group_by") or ""
+        return cls(
+            group_by=tuple(dim.strip().upper() for dim in group_by.split(",") if dim.strip()),
+            agg=(params.get("agg") or "sum").lower(),
+        )
+
+    def to_params(self):
+        params = {"agg": self.agg}
+        if self.group_by:
+            params["group_by"] = ",".join(self.group_by)
+        return params
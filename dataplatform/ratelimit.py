@@ -0,0 +1,166 @@
+"""Per-key token-bucket rate limiting and daily quotas for the API server.
+
+Every request costs tokens in proportion to the rows it returns, weighted by
+output format, so one full-history Excel export drains a bucket that would
+otherwise admit many small JSON requests. Buckets refill continuously at the
+key's rate up to its burst size; a request larger than the burst size puts the
+bucket into debt for the rest of its price. Independently, the tokens spent
+per UTC day are capped by the key's daily quota.
+
+``RateLimiter`` keeps the buckets in process memory. ``SharedRateLimiter``
+keeps them in SQLite so all server workers draw from the same buckets.
+"""
+
+import datetime
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+# Defaults for keys created without explicit limits
+DEFAULT_RATE = 10.0          # tokens per second
+DEFAULT_BURST = 100.0        # bucket size
+DEFAULT_DAILY_QUOTA = 50_000.0  # tokens per UTC day
+
+# One token per request plus one per ROWS_PER_TOKEN rows, times the format weight
+ROWS_PER_TOKEN = 1_000
+FORMAT_WEIGHTS = {
+    "json": 1.0,
+    "ndjson": 1.0,
+    "csv": 1.0,
+    "excel": 4.0,
+    "arrow": 0.5,
+    "parquet": 0.5,
+}
+
+# Set to a SQLite path to share buckets between server workers
+RATE_LIMIT_DB = os.environ.get("DATA_PLATFORM_RATE_LIMIT_DB")
+
+
+@dataclass(frozen=True)
+class Limits:
+    """Token-bucket and quota settings of one API key."""
+
+    rate: float = DEFAULT_RATE
+    burst: float = DEFAULT_BURST
+    daily_quota: float = DEFAULT_DAILY_QUOTA
+
+    def __post_init__(self):
+        if self.rate <= 0 or self.burst < 1 or self.daily_quota < 1:
+            raise ValueError("rate must be positive, burst and daily_quota at least 1")
+
+
+def request_cost(rows, fmt):
+    """Tokens charged for returning ``rows`` rows in format ``fmt``."""
+    return (1 + rows / ROWS_PER_TOKEN) * FORMAT_WEIGHTS.get(fmt, 1.0)
+
+
+def _today(now):
+    return datetime.datetime.fromtimestamp(now, datetime.timezone.utc).date().isoformat()
+
+
+def _seconds_to_midnight(now):
+    moment = datetime.datetime.fromtimestamp(now, datetime.timezone.utc)
+    midnight = datetime.datetime.combine(
+        moment.date() + datetime.timedelta(days=1), datetime.time(), datetime.timezone.utc
+    )
+    return (midnight - moment).total_seconds()
+
+
+def _take(state, limits, cost, now):
+    """Apply one request to a bucket.
+
+    ``state`` is ``(tokens, updated, day, spent)`` or None for a new key.
+    Returns the new state and the seconds to wait, 0.0 if the request is
+    admitted. Admitted requests are charged their full cost. One costing more
+    than the burst size is admitted once the bucket is full and leaves it in
+    debt (negative tokens), so later requests wait until the whole price has
+    been refilled; likewise one costing more than the daily quota is only
+    admitted as the first request of the day.
+    """
+    day = _today(now)
+    if state is None:
+        tokens, spent = limits.burst, 0.0
+    else:
+        tokens, updated, state_day, spent = state
+        tokens = min(limits.burst, tokens + (now - updated) * limits.rate)
+        if state_day != day:
+            spent = 0.0
+
+    if spent and spent + cost > limits.daily_quota:
+        return (tokens, now, day, spent), _seconds_to_midnight(now)
+    required = min(cost, limits.burst)
+    if tokens < required:
+        return (tokens, now, day, spent), (required - tokens) / limits.rate
+    return (tokens - cost, now, day, spent + cost), 0.0
+
+
+class RateLimiter:
+    """Token buckets held in process memory."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key_hash, limits, cost):
+        """Charge ``cost`` tokens; returns the Retry-After seconds, 0.0 if admitted."""
+        with self._lock:
+            state, wait = _take(self._buckets.get(key_hash), limits, cost, time.time())
+            self._buckets[key_hash] = state
+        return wait
+
+
+class SharedRateLimiter:
+    """Token buckets in SQLite, shared by every process using the same file."""
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS rate_buckets (
+        key_hash TEXT PRIMARY KEY,
+        tokens   REAL NOT NULL,
+        updated  REAL NOT NULL,
+        day      TEXT NOT NULL,
+        spent    REAL NOT NULL
+    )
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(self._SCHEMA)
+
+    def _conn(self):
+        # One connection per thread, in autocommit mode so transactions are explicit
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def acquire(self, key_hash, limits, cost):
+        """Charge ``cost`` tokens; returns the Retry-After seconds, 0.0 if admitted."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            state = conn.execute(
+                "SELECT tokens, updated, day, spent FROM rate_buckets WHERE key_hash = ?",
+                (key_hash,),
+            ).fetchone()
+            state, wait = _take(state, limits, cost, time.time())
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (key_hash, tokens, updated, day, spent) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key_hash, *state),
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return wait
+
+
+def create_limiter(path=RATE_LIMIT_DB):
+    """Shared limiter when a database path is configured, in-memory otherwise."""
+    return SharedRateLimiter(path) if path else RateLimiter()
@@ -0,0 +1,359 @@
+"""Columnar on-disk snapshot of the reserves workbook.
+
+The workbook is parsed with openpyxl once per version. The cleaned columns are
+written as one ``.npy`` file per column so that later loads memory-map them
+instead of re-reading Excel. Dimension columns are stored as int32 codes into
+the manifest vocabulary and OBS_DATE as int32 day numbers (see dataset.py).
+Rows are stored sorted by OBS_DATE (workbook order within a date), so every
+date range is a contiguous slice of rows.
+
+The filter index and chart cube computed from a version are stored next to
+its columns (``derived/``) by the first process that loads it, so every other
+process memory-maps them instead of holding its own copy. Version
+directories are never modified once published and ``CURRENT`` is swapped
+with an atomic rename, so readers always see one complete version. The
+workbook mtime recorded in a version's manifest is the one it was ingested
+from; later touches of an identical workbook are recorded in ``CHECKED``,
+next to ``CURRENT``.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from dataplatform import metrics
+
+DATA_FILE = "your_data_file.xlsx"
+DATA_SHEET = 2
+SNAPSHOT_DIR = ".snapshot"
+
+COLUMNS = ['CURRENCY', 'ITEM', 'OBS_DATE', 'RESIDUAL_MATURITY', 'AMOUNT']
+DIMENSIONS = ['ITEM', 'CURRENCY', 'RESIDUAL_MATURITY']
+
+# Bump whenever the on-disk layout changes so stale snapshots are rebuilt
+FORMAT_VERSION = 3
+
+# Whether astype(str) keeps missing values missing (pandas 3) rather than
+# turning them into "nan", i.e. whether clean_frame drops rows with missing dimensions
+_STR_KEEPS_MISSING = bool(pd.isna(pd.Series([None], dtype=object).astype(str).iloc[0]))
+
+MANIFEST = "manifest.json"
+CURRENT = "CURRENT"
+CHECKED = "CHECKED"
+DERIVED = "derived"
+
+
+def clean_frame(df):
+    """Apply the type coercion the app expects and drop incomplete rows."""
+    df['OBS_DATE'] = pd.to_datetime(df['OBS_DATE'], errors='coerce')
+    df['ITEM'] = df['ITEM'].astype(str)
+    df['CURRENCY'] = df['CURRENCY'].astype(str)
+    df['RESIDUAL_MATURITY'] = df['RESIDUAL_MATURITY'].astype(str)
+    df['AMOUNT'] = pd.to_numeric(df['AMOUNT'], errors='coerce')
+    return df.dropna(subset=COLUMNS)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json(path, payload):
+    tmp = f"{path}.tmp-{uuid.uuid4().hex}"
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump(payload, fh)
+    os.replace(tmp, path)
+
+
+def read_manifest(version=None, snapshot_dir=SNAPSHOT_DIR):
+    """Return the manifest of ``version`` (default: the current one), or None."""
+    try:
+        if version is None:
+            with open(os.path.join(snapshot_dir, CURRENT), encoding='utf-8') as fh:
+                version = fh.read().strip()
+        with open(os.path.join(snapshot_dir, version, MANIFEST), encoding='utf-8') as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _publish(manifest, snapshot_dir):
+    """Point CURRENT at ``manifest['version']`` atomically."""
+    tmp = os.path.join(snapshot_dir, f"{CURRENT}.tmp-{uuid.uuid4().hex}")
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        fh.write(manifest['version'])
+    os.replace(tmp, os.path.join(snapshot_dir, CURRENT))
+
+
+def _source(path, sheet, sha256):
+    stat = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "sheet": sheet,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": sha256,
+    }
+
+
+def _write_version(manifest, columns, snapshot_dir):
+    """Write ``columns`` and ``manifest`` as a new version directory and publish it.
+
+    ``columns`` maps a column name to either an array or a callable that
+    writes the ``.npy`` file itself when given its path.
+    """
+    version = manifest["version"]
+    os.makedirs(snapshot_dir, exist_ok=True)
+    tmp_dir = os.path.join(snapshot_dir, f"{version}.tmp-{uuid.uuid4().hex}")
+    os.makedirs(tmp_dir)
+    for col, values in columns.items():
+        target = os.path.join(tmp_dir, f"{col}.npy")
+        if callable(values):
+            values(target)
+        else:
+            np.save(target, values)
+    _write_json(os.path.join(tmp_dir, MANIFEST), manifest)
+
+    try:
+        os.rename(tmp_dir, os.path.join(snapshot_dir, version))
+    except OSError:
+        # Another process published the same version first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    _publish(manifest, snapshot_dir)
+    return manifest
+
+
+def write_derived(version, arrays, snapshot_dir=SNAPSHOT_DIR):
+    """Store ``{name: array}`` computed from ``version`` in its ``derived`` directory.
+
+    Written to a temporary directory and renamed into place, so readers see
+    all arrays or none. If another process stored them first, its copy is kept.
+    """
+    target = os.path.join(snapshot_dir, version, DERIVED)
+    tmp_dir = f"{target}.tmp-{uuid.uuid4().hex}"
+    os.makedirs(tmp_dir)
+    for name, values in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), values)
+    try:
+        os.rename(tmp_dir, target)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def read_derived(version, snapshot_dir=SNAPSHOT_DIR):
+    """Memory-map the derived arrays of ``version``, or None if not stored yet."""
+    directory = os.path.join(snapshot_dir, version, DERIVED)
+    if not os.path.isdir(directory):
+        return None
+    return {
+        name[:-len(".npy")]: np.load(os.path.join(directory, name), mmap_mode='r')
+        for name in os.listdir(directory)
+        if name.endswith(".npy")
+    }
+
+
+def _day_numbers(dates):
+    return dates.to_numpy('datetime64[D]').astype(np.int32)
+
+
+def write_frame(df, manifest, snapshot_dir=SNAPSHOT_DIR):
+    """Encode a cleaned frame as the snapshot version described by ``manifest``.
+
+    ``manifest`` needs ``version`` and ``source``; the format, row count and
+    vocabularies are added here. Used by :func:`ingest` and by the benchmarks,
+    which write synthetic frames larger than a worksheet can hold.
+    """
+    df = df.sort_values('OBS_DATE', kind='stable')
+    columns, vocab = {}, {}
+    for col in DIMENSIONS:
+        codes, uniques = pd.factorize(df[col], sort=True)
+        columns[col] = codes.astype(np.int32)
+        vocab[col] = [str(v) for v in uniques]
+    columns['OBS_DATE'] = _day_numbers(df['OBS_DATE'])
+    columns['AMOUNT'] = df['AMOUNT'].to_numpy('float64')
+
+    manifest = {**manifest, "format": FORMAT_VERSION, "rows": len(df), "vocab": vocab}
+    return _write_version(manifest, columns, snapshot_dir)
+
+
+@metrics.span("snapshot.parse")
+def read_workbook(path=DATA_FILE, sheet=DATA_SHEET):
+    """Parse sheet ``sheet`` of the workbook, uncleaned."""
+    return pd.read_excel(path, sheet)
+
+
+@metrics.span("snapshot.ingest")
+def ingest(path=DATA_FILE, sheet=DATA_SHEET, snapshot_dir=SNAPSHOT_DIR, sha256=None, raw=None):
+    """Parse the workbook once and write a typed columnar snapshot.
+
+    ``raw`` is the workbook already parsed by :func:`read_workbook`; it is
+    cleaned in place.
+    """
+    sha256 = sha256 or file_sha256(path)
+    df = clean_frame(read_workbook(path, sheet) if raw is None else raw)
+    manifest = {
+        "version": f"v{FORMAT_VERSION}-{sha256[:16]}-{sheet}",
+        "source": _source(path, sheet, sha256),
+    }
+    return write_frame(df, manifest, snapshot_dir)
+
+
+def _appender(old_path, values):
+    """Writer for a column file holding the old column followed by ``values``."""
+    def write(target):
+        old = np.load(old_path, mmap_mode='r')
+        out = np.lib.format.open_memmap(target, mode='w+', dtype=old.dtype, shape=(len(old) + len(values),))
+        out[:len(old)] = old
+        out[len(old):] = values
+        out.flush()
+        del out
+    return write
+
+
+def _stored_dates(version, snapshot_dir):
+    """Sorted distinct day numbers of ``version``.
+
+    Taken from its derived arrays when stored, otherwise read off the
+    date-sorted OBS_DATE column without sorting it again.
+    """
+    derived = read_derived(version, snapshot_dir)
+    if derived is not None and 'dates' in derived:
+        return derived['dates']
+    days = np.load(os.path.join(snapshot_dir, version, "OBS_DATE.npy"), mmap_mode='r')
+    if not len(days):
+        return days
+    return days[np.flatnonzero(np.diff(days, prepend=days[0] - 1))]
+
+
+def _matches(df, base, vocab):
+    """Whether the cleaned, date-sorted ``df`` encodes to the columns stored in ``base``."""
+    stored = {col: np.load(os.path.join(base, f"{col}.npy"), mmap_mode='r') for col in COLUMNS}
+    for col in DIMENSIONS:
+        lookup = {v: i for i, v in enumerate(vocab[col])}
+        codes = df[col].map(lookup).fillna(-1).to_numpy(np.int64)
+        if not np.array_equal(codes, stored[col]):
+            return False
+    return (
+        np.array_equal(_day_numbers(df['OBS_DATE']), stored['OBS_DATE'])
+        and np.array_equal(df['AMOUNT'].to_numpy('float64'), stored['AMOUNT'])
+    )
+
+
+@metrics.span("snapshot.append")
+def append(manifest, path=DATA_FILE, sheet=DATA_SHEET, snapshot_dir=SNAPSHOT_DIR, sha256=None, raw=None):
+    """Add the rows of observation dates newer than ``manifest``'s snapshot.
+
+    Only the new rows are cleaned and encoded; existing codes stay valid
+    because new dimension values are appended to the vocabularies. The new
+    version records its ``parent`` and ``appended`` row count so a loaded
+    dataset can be extended instead of rebuilt.
+
+    Returns None when the workbook is not a pure append: no new dates, new
+    dates older than the latest snapshot date, or rows of the dates already
+    in the snapshot that differ from the stored ones (added, removed or
+    revised). Callers then fall back to a full :func:`ingest`, passing the
+    same ``raw`` frame (see :func:`read_workbook`) so the workbook is parsed
+    once; ``raw`` is not modified here.
+    """
+    sha256 = sha256 or file_sha256(path)
+    base = os.path.join(snapshot_dir, manifest["version"])
+    old_dates = _stored_dates(manifest["version"], snapshot_dir)
+    if not len(old_dates):
+        return None
+    last_day = int(old_dates[-1])
+
+    if raw is None:
+        raw = read_workbook(path, sheet)
+    obs_date = pd.to_datetime(raw['OBS_DATE'], errors='coerce')
+    valid = obs_date.notna() & pd.to_numeric(raw['AMOUNT'], errors='coerce').notna()
+    if _STR_KEEPS_MISSING:
+        valid &= raw[DIMENSIONS].notna().all(axis=1)
+    valid = valid.to_numpy()
+    days = np.where(valid, obs_date.to_numpy('datetime64[D]').astype('int64'), last_day)
+
+    is_new = valid & (days > last_day)
+    # Binary search over the sorted stored dates instead of re-sorting them
+    pos = np.minimum(np.searchsorted(old_dates, days), len(old_dates) - 1)
+    is_known = old_dates[pos] == days
+    if not is_new.any() or (valid & ~is_new & ~is_known).any():
+        return None
+    if int((valid & is_known).sum()) != manifest["rows"]:
+        return None
+    known = clean_frame(raw[valid & is_known].copy()).sort_values('OBS_DATE', kind='stable')
+    if not _matches(known, base, manifest["vocab"]):
+        return None
+
+    new = clean_frame(raw[is_new].copy()).sort_values('OBS_DATE', kind='stable')
+    vocab = {dim: list(values) for dim, values in manifest["vocab"].items()}
+    columns = {}
+    for col in DIMENSIONS:
+        lookup = {v: i for i, v in enumerate(vocab[col])}
+        for value in new[col].unique():
+            if value not in lookup:
+                lookup[value] = len(vocab[col])
+                vocab[col].append(str(value))
+        codes = new[col].map(lookup).to_numpy(np.int32)
+        columns[col] = _appender(os.path.join(base, f"{col}.npy"), codes)
+    columns['OBS_DATE'] = _appender(os.path.join(base, "OBS_DATE.npy"), _day_numbers(new['OBS_DATE']))
+    columns['AMOUNT'] = _appender(os.path.join(base, "AMOUNT.npy"), new['AMOUNT'].to_numpy('float64'))
+
+    child = {
+        "format": FORMAT_VERSION,
+        "version": f"v{FORMAT_VERSION}-{sha256[:16]}-{sheet}",
+        "rows": manifest["rows"] + len(new),
+        "parent": manifest["version"],
+        "appended": len(new),
+        "source": _source(path, sheet, sha256),
+        "vocab": vocab,
+    }
+    return _write_version(child, columns, snapshot_dir)
+
+
+def _stat_of(source):
+    return {"mtime_ns": source["mtime_ns"], "size": source["size"]}
+
+
+def _read_checked(version, snapshot_dir):
+    """Workbook mtime and size last found identical to ``version``, or None."""
+    try:
+        with open(os.path.join(snapshot_dir, CHECKED), encoding='utf-8') as fh:
+            checked = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    return _stat_of(checked) if checked.get("version") == version else None
+
+
+def refresh(path=DATA_FILE, sheet=DATA_SHEET, snapshot_dir=SNAPSHOT_DIR):
+    """Return the manifest for the workbook, ingesting it only if it changed.
+
+    An unchanged mtime and size is trusted without hashing. A touched but
+    identical workbook is detected by hash and its mtime and size recorded in
+    ``CHECKED``; the published version directory is left as it is.
+    A workbook that only adds newer observation dates is appended to the
+    current snapshot; anything else is re-ingested in full.
+    """
+    manifest = read_manifest(snapshot_dir=snapshot_dir)
+    stat = os.stat(path)
+    if manifest is not None and manifest.get("format") == FORMAT_VERSION:
+        source = manifest["source"]
+        if source["sheet"] == sheet and source["path"] == os.path.abspath(path):
+            seen = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+            if _stat_of(source) == seen or _read_checked(manifest["version"], snapshot_dir) == seen:
+                return manifest
+            sha256 = file_sha256(path)
+            if source["sha256"] == sha256:
+                _write_json(os.path.join(snapshot_dir, CHECKED), {"version": manifest["version"], **seen})
+                return manifest
+            raw = read_workbook(path, sheet)
+            appended = append(manifest, path, sheet, snapshot_dir, sha256=sha256, raw=raw)
+            return appended or ingest(path, sheet, snapshot_dir, sha256=sha256, raw=raw)
+    return ingest(path, sheet, snapshot_dir)
+
@@ -0,0 +1,31 @@
+"""File object for writers whose output is streamed instead of stored."""
+
+import io
+
+
+class Sink(io.RawIOBase):
+    """Unseekable file object collecting what a writer produces; tell() counts bytes.
+
+    The ZIP writer of the XLSX export and the Arrow and Parquet writers write
+    into it, and the caller yields whatever :meth:`drain` returns.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
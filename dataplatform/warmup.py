@@ -0,0 +1,68 @@
+"""Background pre-warming at boot, with a logged cold-start budget.
+
+``start`` returns at once. A daemon thread loads the current dataset
+(ingesting the workbook if it changed, then mapping the index and cube) and
+imports modules that are otherwise imported on first use, such as plotly.
+Requests that arrive meanwhile wait for the same load instead of starting
+their own. The time of each step is logged against COLD_START_BUDGET.
+"""
+
+import importlib
+import logging
+import os
+import threading
+import time
+
+from dataplatform import dataset
+from dataplatform.snapshot import DATA_FILE, DATA_SHEET, SNAPSHOT_DIR
+
+logger = logging.getLogger(__name__)
+
+# Seconds from boot until the dataset is ready; slower starts log a warning
+COLD_START_BUDGET = float(os.environ.get("DATA_PLATFORM_COLD_START_BUDGET", "3.0"))
+
+_thread = None
+_lock = threading.Lock()
+
+
+def start(boot_time, modules=(), path=DATA_FILE, sheet=DATA_SHEET, snapshot_dir=SNAPSHOT_DIR):
+    """Start warming up once per process; ``boot_time`` is a ``time.perf_counter()`` value."""
+    global _thread
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(
+                target=_warm,
+                args=(boot_time, modules, path, sheet, snapshot_dir),
+                name="warmup",
+                daemon=True,
+            )
+            _thread.start()
+        return _thread
+
+
+def _warm(boot_time, modules, path, sheet, snapshot_dir):
+    started = time.perf_counter()
+    timings = {"imports": started - boot_time}
+    try:
+        dataset.current(path, sheet, snapshot_dir)
+    except Exception:
+        logger.exception("Dataset warm-up failed; it will be loaded by the first request")
+        return
+    timings["dataset"] = time.perf_counter() - started
+    ready = time.perf_counter() - boot_time
+
+    for name in modules:
+        step = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue
+        timings[name] = time.perf_counter() - step
+
+    report = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in timings.items())
+    if ready > COLD_START_BUDGET:
+        logger.warning("Cold start: data ready after %.2f s, over the %.1f s budget (%s)",
+                       ready, COLD_START_BUDGET, report)
+    else:
+        logger.info("Cold start: data ready after %.2f s of %.1f s budget (%s)",
+                    ready, COLD_START_BUDGET, report)
@@ -0,0 +1,178 @@
+"""Write-only streaming XLSX export for the published five-column schema.
+
+The workbook is produced part by part into a ZIP stream: the shared string
+table is the dimension vocabularies, so rows only reference string indexes,
+and worksheet XML is compressed and yielded batch by batch. Memory stays
+constant in the number of rows. Results longer than one sheet allows are
+split across Sheet1, Sheet2, ...
+"""
+
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from dataplatform.snapshot import COLUMNS, DIMENSIONS
+from dataplatform.streams import Sink
+
+# Excel's row limit, less the header row
+MAX_SHEET_ROWS = 1_048_575
+BATCH_ROWS = 10_000
+
+# Days between Excel's 1899-12-30 epoch and 1970-01-01
+EXCEL_EPOCH_OFFSET = 25569
+
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+    '{sheets}'
+    '</Types>'
+)
+_SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{n}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets>{sheets}</sheets></workbook>'
+)
+_WORKBOOK_SHEET = '<sheet name="Sheet{n}" sheetId="{n}" r:id="rId{n}"/>'
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '{sheets}'
+    '<Relationship Id="rIdStyles" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '<Relationship Id="rIdStrings" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" Target="sharedStrings.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK_SHEET_REL = (
+    '<Relationship Id="rId{n}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet{n}.xml"/>'
+)
+# Style 1: dates as YYYY-MM-DD HH:MM:SS (as pandas writes them), style 2: bold header
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm:ss"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetData>'
+)
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+_LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def _shared_string(value):
+    value = _INVALID_XML.sub('', str(value))
+    space = ' xml:space="preserve"' if value != value.strip() else ''
+    return f'<si><t{space}>{escape(value)}</t></si>'
+
+
+def _shared_strings(dataset):
+    """Shared string table (headers then vocabularies) and each dimension's offset in it."""
+    strings = list(COLUMNS)
+    offsets = {}
+    for dim in DIMENSIONS:
+        offsets[dim] = len(strings)
+        strings.extend(dataset.vocab[dim])
+    xml = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" count="{len(strings)}" uniqueCount="{len(strings)}">'
+        + ''.join(map(_shared_string, strings))
+        + '</sst>'
+    )
+    return xml, offsets
+
+
+def _header_row():
+    cells = ''.join(
+        f'<c r="{_LETTERS[i]}1" t="s" s="2"><v>{i}</v></c>' for i in range(len(COLUMNS))
+    )
+    return f'<row r="1">{cells}</row>'
+
+
+def _sheet_rows(dataset, rows, offsets, first_row):
+    """Worksheet XML of the selected rows, starting at spreadsheet row ``first_row``."""
+    numbers = np.arange(first_row, first_row + len(rows)).astype(str).astype(object)
+    xml = '<row r="' + numbers + '">'
+    for i, col in enumerate(COLUMNS):
+        ref = f'<c r="{_LETTERS[i]}' + numbers
+        values = np.asarray(dataset.columns[col])[rows]
+        if col in DIMENSIONS:
+            text = (values + offsets[col]).astype(str).astype(object)
+            xml = xml + ref + '" t="s"><v>' + text + '</v></c>'
+        elif col == 'OBS_DATE':
+            text = (values.astype(np.int64) + EXCEL_EPOCH_OFFSET).astype(str).astype(object)
+            xml = xml + ref + '" s="1"><v>' + text + '</v></c>'
+        else:
+            finite = np.isfinite(values)
+            text = np.array(list(map(float.__repr__, values.tolist())), dtype=object)
+            cell = ref + '"><v>' + text + '</v></c>'
+            if not finite.all():
+                # Excel has no NaN or infinity; leave such cells empty
+                cell[~finite] = (ref[~finite] + '"/>')
+            xml = xml + cell
+    return ''.join((xml + '</row>').tolist()).encode('utf-8')
+
+
+def iter_xlsx(dataset, rows, max_sheet_rows=MAX_SHEET_ROWS, batch_rows=BATCH_ROWS):
+    """Stream the selected rows of ``dataset`` as an .xlsx file."""
+    sheet_count = max(1, -(-len(rows) // max_sheet_rows))
+    sink = Sink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        numbers = range(1, sheet_count + 1)
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES.format(
+            sheets=''.join(_SHEET_CONTENT_TYPE.format(n=n) for n in numbers)))
+        archive.writestr('_rels/.rels', _ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _WORKBOOK.format(
+            sheets=''.join(_WORKBOOK_SHEET.format(n=n) for n in numbers)))
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS.format(
+            sheets=''.join(_WORKBOOK_SHEET_REL.format(n=n) for n in numbers)))
+        archive.writestr('xl/styles.xml', _STYLES)
+        strings, offsets = _shared_strings(dataset)
+        archive.writestr('xl/sharedStrings.xml', strings)
+        yield sink.drain()
+
+        for n in numbers:
+            sheet_rows = rows[(n - 1) * max_sheet_rows:n * max_sheet_rows]
+            with archive.open(f'xl/worksheets/sheet{n}.xml', 'w') as part:
+                part.write((_SHEET_HEAD + _header_row()).encode('utf-8'))
+                for start in range(0, len(sheet_rows), batch_rows):
+                    batch = sheet_rows[start:start + batch_rows]
+                    part.write(_sheet_rows(dataset, batch, offsets, start + 2))
+                    chunk = sink.drain()
+                    if chunk:
+                        yield chunk
+                part.write(_SHEET_TAIL.encode('utf-8'))
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,40 @@
+import os
+
+import pandas as pd
+import pytest
+
+from dataplatform.snapshot import DATA_SHEET
+
+DATES = pd.to_datetime(["2024-09-30", "2024-10-31", "2024-11-30", "2024-12-31"])
+
+
+def make_frame(dates=DATES, currencies=("EURO", "US DOLLAR")):
+    """Workbook-shaped rows: one series per item, currency and maturity, one row per date."""
+    records = []
+    for i, item in enumerate(["RESERVE ASSETS : TOTAL", "RESERVE ASSETS : GOLD", "RESERVE ASSETS : SDRS"]):
+        for j, currency in enumerate(currencies):
+            for k, maturity in enumerate(["TOTAL", "UP TO 1 MONTH"]):
+                for d, date in enumerate(dates):
+                    records.append({
+                        'CURRENCY': currency,
+                        'ITEM': item,
+                        'OBS_DATE': date,
+                        'RESIDUAL_MATURITY': maturity,
+                        'AMOUNT': float(100 * i + 10 * j + k + d / 10),
+                    })
+    return pd.DataFrame(records)
+
+
+def write_workbook(df, path, sheet=DATA_SHEET):
+    with pd.ExcelWriter(path) as writer:
+        for i in range(sheet):
+            pd.DataFrame().to_excel(writer, sheet_name=f"Sheet{i + 1}")
+        df.to_excel(writer, sheet_name="Data", index=False)
+    # Distinct mtime even on filesystems with coarse timestamps
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    return str(tmp_path / "data.xlsx")
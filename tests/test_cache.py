@@ -0,0 +1,33 @@
+import numpy as np
+
+from dataplatform.cache import QueryCache
+
+
+def test_versions_do_not_evict_each_other():
+    cache = QueryCache()
+    cache.put("v1", ("csv", "q"), b"old")
+    cache.put("v2", ("csv", "q"), b"new")
+
+    # A request still holding the previous dataset does not wipe the new version
+    assert cache.get("v1", ("csv", "q")) == b"old"
+    assert cache.get("v2", ("csv", "q")) == b"new"
+    cache.put("v1", ("json", "q"), b"old json")
+    assert cache.get("v2", ("csv", "q")) == b"new"
+
+
+def test_old_versions_age_out_by_lru():
+    cache = QueryCache(max_entries=2)
+    cache.put("v1", "a", b"1")
+    cache.put("v2", "a", b"2")
+    cache.put("v2", "b", b"3")
+    assert cache.get("v1", "a") is None
+    assert cache.get("v2", "a") == b"2"
+
+
+def test_size_bound_counts_arrays_and_tuples():
+    cache = QueryCache(max_bytes=100)
+    cache.put("v1", "rows", np.zeros(10, dtype=np.int64))
+    cache.put("v1", "figure", (b"x" * 30, ("caption",)))
+    # 80 + 30 bytes exceed the bound, so the least recently used rows go
+    assert cache.stats()["bytes"] == 30
+    assert cache.get("v1", "rows") is None
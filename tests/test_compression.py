@@ -0,0 +1,19 @@
+import pytest
+
+from dataplatform import compression
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("gzip", "gzip"),
+    ("gzip;q=0", None),
+    ("gzip;foo=1;q=0", None),
+    ("gzip; foo=1 ; Q=0.0", None),
+    ("gzip;q=0, *;q=0.5", None),
+    ("identity, gzip;level=9;q=0.5", "gzip"),
+    ("gzip;q=nonsense", None),
+])
+def test_negotiate_reads_q_from_any_parameter(header, expected, monkeypatch):
+    monkeypatch.setattr(compression, "PREFERENCE", ["gzip"])
+    assert compression.negotiate(header) == expected
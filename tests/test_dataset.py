@@ -0,0 +1,33 @@
+import pytest
+
+from dataplatform import dataset
+from tests.conftest import DATES, make_frame, write_workbook
+
+
+@pytest.fixture
+def fresh_current(monkeypatch):
+    monkeypatch.setattr(dataset, "_current", None)
+    monkeypatch.setattr(dataset, "_checked", 0.0)
+    monkeypatch.setattr(dataset, "CHECK_INTERVAL", 0)
+
+
+def test_current_keeps_serving_when_workbook_is_unreadable(workbook, tmp_path, fresh_current):
+    snapshot_dir = str(tmp_path / "snapshot")
+    write_workbook(make_frame(DATES), workbook)
+    loaded = dataset.current(workbook, 2, snapshot_dir)
+
+    # Partially copied workbook
+    with open(workbook, "r+b") as fh:
+        fh.truncate(100)
+    assert dataset.current(workbook, 2, snapshot_dir) is loaded
+    assert dataset.current(workbook, 2, snapshot_dir) is loaded
+
+    write_workbook(make_frame(DATES[:2]), workbook)
+    assert len(dataset.current(workbook, 2, snapshot_dir)) == len(make_frame(DATES[:2]))
+
+
+def test_current_raises_without_loaded_version(workbook, tmp_path, fresh_current):
+    with open(workbook, "wb") as fh:
+        fh.write(b"PK\x03\x04 truncated")
+    with pytest.raises(Exception):
+        dataset.current(workbook, 2, str(tmp_path / "snapshot"))
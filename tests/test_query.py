@@ -0,0 +1,63 @@
+import datetime
+
+import pytest
+
+from dataplatform import snapshot
+from dataplatform.dataset import Dataset
+from dataplatform.query import Page, Query
+from tests.conftest import DATES, make_frame, write_workbook
+
+
+@pytest.mark.parametrize("params, dates", [
+    ({"date": ""}, None),
+    ({"date": "NaT"}, None),
+    ({"date": "not a date"}, None),
+    ({"dates": ""}, ()),
+    ({"dates": "2024-12-31,"}, (datetime.date(2024, 12, 31),)),
+    ({"dates": ",2024-11-30,,2024-12-31"}, (datetime.date(2024, 11, 30), datetime.date(2024, 12, 31))),
+    ({"date": "", "dates": "2024-12-31"}, (datetime.date(2024, 12, 31),)),
+    ({"date": "2024-12-31", "dates": "2024-11-30,2024-12-31"}, (datetime.date(2024, 12, 31),)),
+])
+def test_from_params_skips_empty_dates(params, dates):
+    assert Query.from_params(params).dates == dates
+
+
+@pytest.mark.parametrize("value", ["", "NaT", "nonsense"])
+def test_from_params_ignores_empty_range_bounds(value):
+    query = Query.from_params({"start": value, "end": value})
+    assert query.start is None and query.end is None
+    assert not query.has_dates
+
+
+def test_empty_date_params_filter_without_error(workbook, tmp_path):
+    write_workbook(make_frame(DATES), workbook)
+    snapshot_dir = str(tmp_path / "snapshot")
+    data = Dataset.load(snapshot.ingest(workbook, snapshot.DATA_SHEET, snapshot_dir)["version"], snapshot_dir)
+
+    assert len(data.rows(Query.from_params({"date": ""}))) == len(data)
+    assert len(data.rows(Query.from_params({"dates": ""}))) == 0
+    assert len(data.rows(Query.from_params({"dates": "2024-12-31,"}))) == len(data) // len(DATES)
+    assert len(data.rows(Query.from_params({"start": "NaT", "end": "2024-10-31"}))) == len(data) // 2
+
+
+@pytest.mark.parametrize("params, page", [
+    ({}, Page()),
+    ({"offset": "10", "limit": "5"}, Page(offset=10, limit=5)),
+    ({"offset": 10, "limit": 0}, Page(offset=10, limit=0)),
+    ({"limit": None, "sort": "AMOUNT"}, Page(sort="AMOUNT")),
+    ({"sort": "-AMOUNT"}, Page(sort="AMOUNT", descending=True)),
+])
+def test_page_from_params(params, page):
+    assert Page.from_params(params) == page
+    assert Page.from_params(page.to_params()) == page
+
+
+@pytest.mark.parametrize("params", [{"sort": "-NOPE"}, {"offset": "-1"}, {"limit": "x"}])
+def test_page_from_params_rejects_invalid(params):
+    with pytest.raises(ValueError):
+        Page.from_params(params)
+
+
+@pytest.mark.parametrize("page", [Page(), Page(offset=3), Page(limit=4), Page(offset=8, limit=4), Page(offset=20, limit=4)])
+def test_page_count_matches_apply(page):
+    assert page.count(10) == len(page.apply(list(range(10))))
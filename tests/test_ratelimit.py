@@ -0,0 +1,47 @@
+import pytest
+
+from dataplatform.ratelimit import Limits, RateLimiter, SharedRateLimiter, _take, request_cost
+
+LIMITS = Limits(rate=10, burst=100, daily_quota=50_000)
+NOON = 1_735_646_400.0  # 2024-12-31 12:00 UTC
+
+
+def test_large_request_is_charged_in_full():
+    cost = request_cost(10_000_000, "excel")
+    state, wait = _take(None, LIMITS, cost, NOON)
+    assert wait == 0.0
+    assert state[0] == LIMITS.burst - cost
+    assert state[3] == cost
+
+    # The next small request waits until the debt is refilled
+    _, wait = _take(state, LIMITS, 1, NOON)
+    assert wait == pytest.approx((1 - state[0]) / LIMITS.rate)
+
+
+def test_large_request_waits_for_a_full_bucket():
+    state, _ = _take(None, LIMITS, 60, NOON)
+    _, wait = _take(state, LIMITS, 1_000, NOON)
+    assert wait == pytest.approx(60 / LIMITS.rate)
+
+
+def test_daily_quota_counts_full_cost():
+    limits = Limits(rate=1_000, burst=100, daily_quota=1_000)
+    state, wait = _take(None, limits, 900, NOON)
+    assert wait == 0.0
+    _, wait = _take(state, limits, 200, NOON + 3600)
+    assert wait == pytest.approx(11 * 3600)
+
+
+def test_request_over_daily_quota_only_as_first_of_the_day():
+    limits = Limits(rate=1_000, burst=100, daily_quota=1_000)
+    state, wait = _take(None, limits, 5_000, NOON)
+    assert wait == 0.0
+    _, wait = _take(state, limits, 5_000, NOON + 3600 * 11)
+    assert wait > 0
+
+
+@pytest.mark.parametrize("make", [RateLimiter, lambda: SharedRateLimiter(":memory:")])
+def test_limiters_charge_full_cost(make):
+    limiter = make()
+    assert limiter.acquire("key", LIMITS, 1_000) == 0.0
+    assert limiter.acquire("key", LIMITS, 1) == pytest.approx(901 / LIMITS.rate, rel=1e-3)
@@ -0,0 +1,151 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataplatform import snapshot
+from dataplatform.cube import CUBE_DIMENSIONS, aggregate, label_totals
+from dataplatform.dataset import Dataset
+from dataplatform.query import Query
+from tests.conftest import DATES, make_frame, write_workbook
+
+
+def _refresh(workbook, snapshot_dir):
+    return snapshot.refresh(workbook, snapshot.DATA_SHEET, snapshot_dir)
+
+
+def _append(workbook, tmp_path, extended):
+    """Dataset appended from a snapshot of the first three dates, and one fully ingested."""
+    snapshot_dir = str(tmp_path / "snapshot")
+    write_workbook(make_frame(DATES[:3]), workbook)
+    parent = Dataset.load(_refresh(workbook, snapshot_dir)["version"], snapshot_dir)
+
+    write_workbook(extended, workbook)
+    manifest = _refresh(workbook, snapshot_dir)
+    assert manifest["parent"] == parent.version
+    assert manifest["appended"] == (extended['OBS_DATE'] == DATES[-1]).sum()
+    appended = Dataset.load(manifest["version"], snapshot_dir, base=parent)
+
+    fresh_dir = str(tmp_path / "fresh")
+    fresh = Dataset.load(snapshot.ingest(workbook, snapshot.DATA_SHEET, fresh_dir)["version"], fresh_dir)
+    return appended, fresh
+
+
+def test_extend_matches_rebuild(workbook, tmp_path):
+    appended, fresh = _append(workbook, tmp_path, make_frame(DATES))
+
+    # FilterIndex.extend gives the arrays of a full rebuild
+    expected, actual = fresh.index.arrays(), appended.index.arrays()
+    assert actual.keys() == expected.keys()
+    for name in expected:
+        np.testing.assert_array_equal(actual[name], expected[name], err_msg=name)
+    assert "OBS_DATE" in appended.index.clustered
+    np.testing.assert_array_equal(appended.dates, fresh.dates)
+
+    # Cube.extend adds the new cells at the end; as a set they equal a rebuild
+    expected, actual = _cells(fresh.cube), _cells(appended.cube)
+    assert actual.keys() == expected.keys()
+    for name in expected:
+        np.testing.assert_array_equal(actual[name], expected[name], err_msg=name)
+
+
+def test_append_with_new_dimension_value(workbook, tmp_path):
+    # The new month brings a currency the snapshot has not seen; its code is
+    # appended to the vocabulary instead of sorted in, so compare decoded results
+    extended = make_frame(DATES, currencies=("EURO", "US DOLLAR", "JAPANESE YEN"))
+    extended = extended[(extended['OBS_DATE'] == DATES[-1]) | (extended['CURRENCY'] != "JAPANESE YEN")]
+    appended, fresh = _append(workbook, tmp_path, extended)
+
+    pd.testing.assert_frame_equal(_decoded(appended), _decoded(fresh))
+    for query in [Query(), Query(currencies=["JAPANESE YEN"]), Query(dates=DATES[-2:].date)]:
+        np.testing.assert_array_equal(appended.rows(query), fresh.rows(query))
+        pd.testing.assert_frame_equal(
+            label_totals(appended, query, by_date=True), label_totals(fresh, query, by_date=True)
+        )
+        pd.testing.assert_frame_equal(
+            aggregate(appended, query, ["CURRENCY", "OBS_DATE"]), aggregate(fresh, query, ["CURRENCY", "OBS_DATE"])
+        )
+
+
+def _cells(cube):
+    """Cube arrays with the cells in code order."""
+    order = np.lexsort([cube.codes[dim] for dim in reversed(CUBE_DIMENSIONS)])
+    return {
+        name: values if name == 'cube.cardinalities' else np.asarray(values)[order]
+        for name, values in cube.arrays().items()
+    }
+
+
+def _decoded(data):
+    frame = data.frame()
+    return frame.astype({dim: str for dim in snapshot.DIMENSIONS})
+
+
+@pytest.mark.parametrize("revise", [
+    lambda df: df.assign(AMOUNT=df['AMOUNT'].where(df.index != 5, 999999.0)),
+    lambda df: df.assign(ITEM=df['ITEM'].where(df.index != 5, "RESERVE ASSETS : REVISED")),
+    lambda df: df.assign(CURRENCY=df['CURRENCY'].where(df.index != 5, "US DOLLAR")),
+    lambda df: df.assign(OBS_DATE=df['OBS_DATE'].where(df.index != 5, DATES[0])),
+], ids=["amount", "new-item", "currency", "date"])
+def test_revision_with_new_dates_is_reingested(workbook, tmp_path, revise):
+    snapshot_dir = str(tmp_path / "snapshot")
+    old = make_frame(DATES[:3])
+    write_workbook(old, workbook)
+    parent = _refresh(workbook, snapshot_dir)
+
+    new = make_frame(DATES)
+    new = pd.concat([revise(new[new['OBS_DATE'] < DATES[-1]]), new[new['OBS_DATE'] == DATES[-1]]])
+    write_workbook(new, workbook)
+    manifest = _refresh(workbook, snapshot_dir)
+    assert "parent" not in manifest
+    assert manifest["version"] != parent["version"]
+
+    data = Dataset.load(manifest["version"], snapshot_dir)
+    expected = snapshot.clean_frame(new.copy()).sort_values('OBS_DATE', kind='stable').reset_index(drop=True)
+    pd.testing.assert_frame_equal(_decoded(data), expected, check_dtype=False, check_index_type=False)
+
+
+def test_refresh_parses_the_workbook_once(workbook, tmp_path, monkeypatch):
+    snapshot_dir = str(tmp_path / "snapshot")
+    write_workbook(make_frame(DATES[:3]), workbook)
+    _refresh(workbook, snapshot_dir)
+
+    parses = []
+    read_workbook = snapshot.read_workbook
+    monkeypatch.setattr(snapshot, "read_workbook", lambda *args: parses.append(args) or read_workbook(*args))
+    # A revision makes append fall back to ingest, which reuses the parsed frame
+    new = make_frame(DATES)
+    write_workbook(new.assign(AMOUNT=new['AMOUNT'] + 1), workbook)
+    manifest = _refresh(workbook, snapshot_dir)
+    assert "parent" not in manifest
+    assert len(parses) == 1
+
+
+def test_stored_dates_without_derived_arrays(workbook, tmp_path):
+    snapshot_dir = str(tmp_path / "snapshot")
+    write_workbook(make_frame(DATES), workbook)
+    version = _refresh(workbook, snapshot_dir)["version"]
+    stored = np.load(tmp_path / "snapshot" / version / "OBS_DATE.npy")
+    np.testing.assert_array_equal(snapshot._stored_dates(version, snapshot_dir), np.unique(stored))
+
+    data = Dataset.load(version, snapshot_dir)
+    np.testing.assert_array_equal(snapshot._stored_dates(version, snapshot_dir), data.dates)
+
+
+def test_touched_workbook_leaves_the_version_unchanged(workbook, tmp_path, monkeypatch):
+    snapshot_dir = str(tmp_path / "snapshot")
+    write_workbook(make_frame(DATES), workbook)
+    manifest = _refresh(workbook, snapshot_dir)
+    published = (tmp_path / "snapshot" / manifest["version"] / snapshot.MANIFEST).read_bytes()
+    modified = Dataset.load(manifest["version"], snapshot_dir).modified
+
+    stat = os.stat(workbook)
+    os.utime(workbook, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert _refresh(workbook, snapshot_dir) == manifest
+    assert (tmp_path / "snapshot" / manifest["version"] / snapshot.MANIFEST).read_bytes() == published
+    assert Dataset.load(manifest["version"], snapshot_dir).modified == modified
+
+    # The touch is remembered, so the next check does not hash the workbook again
+    monkeypatch.setattr(snapshot, "file_sha256", lambda path: pytest.fail("hashed again"))
+    assert _refresh(workbook, snapshot_dir) == manifest